@@ -4,6 +4,11 @@ import django_filters
 
 from recipes.models import Recipe, Tag, Ingredient
 
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
+
 
 class IngredientFilter(SearchFilter):
     """Специальный фильтр для ингредиентов"""
@@ -30,6 +35,19 @@ class MyFilterSet(rest_framework.FilterSet):
     is_in_shopping_cart = django_filters.NumberFilter(
         method='filter_shopping_cart'
     )
+    search = django_filters.CharFilter(method='filter_search')
+    ordering = django_filters.ChoiceFilter(
+        choices=[(name, name) for name in RECIPE_ORDERINGS],
+        method='filter_ordering'
+    )
+
+    def filter_search(self, qs, name, value):
+        if not value.strip():
+            return qs
+        return qs.search(value)
+
+    def filter_ordering(self, qs, name, value):
+        return qs.order_by(*RECIPE_ORDERINGS[value])
 
     def filter_shopping_cart(self, qs, name, value):
         if value == 1:
@@ -41,4 +59,7 @@ class MyFilterSet(rest_framework.FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
+        fields = [
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+            'search', 'ordering'
+        ]
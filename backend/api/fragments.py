@@ -0,0 +1,96 @@
+from django.core.cache import caches
+from django.db.models import prefetch_related_objects
+
+from backend.routers import reads_replica
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.versions import get_label_versions, model_label, object_label
+from users.models import User
+
+FRAGMENT_KEY = 'recipe-fragment:{}:{}:{}'
+
+
+class RecipeFragments:
+    """Кэш представлений рецептов без данных пользователя.
+
+    Фрагмент хранится вместе с версиями рецепта, моделей version_models
+    и, если with_author, автора; действителен, пока они не изменились.
+    """
+
+    def __init__(self, kind, version_models=(), with_author=False):
+        self.kind = kind
+        self.version_models = version_models
+        self.with_author = with_author
+
+    def labels(self, recipe):
+        labels = [object_label(Recipe, recipe.id)]
+        if self.with_author:
+            labels.append(object_label(User, recipe.author_id))
+        labels.extend(model_label(model) for model in self.version_models)
+        return labels
+
+    def key(self, recipe_id, request):
+        """Адреса изображений в представлении зависят от адреса сервера."""
+        base = request.build_absolute_uri('/') if request else ''
+        return FRAGMENT_KEY.format(self.kind, base, recipe_id)
+
+    def load(self, recipes, request):
+        """Находит фрагменты рецептов; возвращает рецепты без фрагмента."""
+        pending = [
+            recipe for recipe in recipes
+            if self.kind not in getattr(recipe, '_fragments', {})
+        ]
+        if pending:
+            keys = {
+                recipe.id: self.key(recipe.id, request) for recipe in pending
+            }
+            values = caches['fragments'].get_many(keys.values())
+            versions = get_label_versions({
+                label for recipe in pending for label in self.labels(recipe)
+            })
+            for recipe in pending:
+                current = {
+                    label: versions[label] for label in self.labels(recipe)
+                }
+                entry = values.get(keys[recipe.id])
+                if entry is not None and entry['versions'] != current:
+                    entry = None
+                if not hasattr(recipe, '_fragments'):
+                    recipe._fragments = {}
+                recipe._fragments[self.kind] = (
+                    None if entry is None else entry['data'], current
+                )
+        return [
+            recipe for recipe in recipes
+            if recipe._fragments[self.kind][0] is None
+        ]
+
+    def get(self, recipe, request):
+        self.load([recipe], request)
+        return recipe._fragments[self.kind][0]
+
+    def versions(self, recipe):
+        """Версии, прочитанные при загрузке фрагмента рецепта."""
+        return recipe._fragments[self.kind][1]
+
+    def save(self, recipe, request, data):
+        """Сохраняет фрагмент с версиями, прочитанными до сборки данных."""
+        versions = self.versions(recipe)
+        recipe._fragments[self.kind] = (data, versions)
+        if not reads_replica():
+            caches['fragments'].set(
+                self.key(recipe.id, request),
+                {'versions': versions, 'data': data}
+            )
+
+
+recipe_fragments = RecipeFragments(
+    'full', version_models=(Tag, Ingredient), with_author=True
+)
+short_recipe_fragments = RecipeFragments('short')
+
+
+def load_recipes(recipes, request):
+    """Теги и ингредиенты рецептов, которых нет в кэше фрагментов."""
+    missing = recipe_fragments.load(recipes, request)
+    if missing:
+        prefetch_related_objects(missing, *Recipe.objects.related_lookups())
@@ -0,0 +1,157 @@
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from backend.routers import pin_to_primary
+
+METRICS = ('queries', 'sql', 'serialize', 'total')
+
+
+class QueryTimer:
+    """Обёртка execute_wrapper: считает запросы и их суммарное время."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class RequestStats:
+    """Скользящее окно последних замеров для каждого view и action."""
+
+    def __init__(self, window):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+
+    def add(self, key, sample):
+        with self.lock:
+            self.samples[key].append(sample)
+
+    @staticmethod
+    def percentile(values, percent):
+        return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+    def snapshot(self):
+        with self.lock:
+            samples = {key: list(value) for key, value in self.samples.items()}
+        report = {}
+        for key, values in sorted(samples.items()):
+            report[key] = {'count': len(values)}
+            for index, metric in enumerate(METRICS):
+                column = sorted(value[index] for value in values)
+                report[key][metric] = {
+                    f'p{percent}': round(self.percentile(column, percent), 2)
+                    for percent in (50, 95, 99)
+                }
+        return report
+
+
+request_stats = RequestStats(settings.REQUEST_STATS_WINDOW)
+
+
+def view_name(request):
+    """Имя view-класса и action, обработавших запрос."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view = getattr(match.func, 'cls', match.func)
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view.__name__}.{action}'
+
+
+class RequestStatsMiddleware:
+    """Замер числа и времени SQL-запросов, сериализации и всего запроса.
+
+    Включается настройкой REQUEST_STATS_ENABLED и замеряет долю
+    REQUEST_STATS_SAMPLE_RATE запросов. Результат отдаётся в заголовке
+    Server-Timing и накапливается в request_stats. Временем сериализации
+    считается работа view и рендеринга ответа за вычетом SQL.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_STATS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.REQUEST_STATS_SAMPLE_RATE
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        end = time.perf_counter()
+        total = end - start
+        view_time = getattr(request, '_stats_view_time', None)
+        if view_time is None:
+            view_time = end - getattr(request, '_stats_view_start', end)
+        serialize = max(view_time - timer.duration, 0.0)
+        sample = (
+            timer.count,
+            timer.duration * 1000,
+            serialize * 1000,
+            total * 1000,
+        )
+        response['Server-Timing'] = (
+            f'db;desc="{timer.count} queries";dur={sample[1]:.2f}, '
+            f'serialize;dur={sample[2]:.2f}, total;dur={sample[3]:.2f}'
+        )
+        name = view_name(request)
+        if name is not None:
+            request_stats.add(name, sample)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._stats_view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        """Добавляет к времени view время рендеринга ответа DRF."""
+        def rendered(response):
+            request._stats_view_time = (
+                time.perf_counter() - request._stats_view_start
+            )
+        if hasattr(request, '_stats_view_start'):
+            response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaPinMiddleware:
+    """После изменяющего запроса пользователь читает основную базу.
+
+    На REPLICA_PIN_SECONDS, пока реплики догоняют запись. Работает,
+    только если настроены реплики.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if (
+            request.method not in SAFE_METHODS
+            and user is not None
+            and user.is_authenticated
+        ):
+            pin_to_primary(user.id)
+        return response
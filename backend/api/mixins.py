@@ -0,0 +1,184 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from rest_framework.permissions import SAFE_METHODS
+
+from backend.routers import (
+    is_pinned,
+    read_from_replica,
+    reads_from,
+    use_primary
+)
+from recipes.versions import get_label_versions, get_versions, model_label
+
+RESPONSE_KEY = 'response:{}'
+
+
+class VersionedCacheMixin:
+    """HTTP-кэширование справочников по версиям моделей.
+
+    ETag строится из версий моделей version_models и адреса запроса,
+    поэтому условный GET с актуальным ETag получает 304 без обращения
+    к базе данных. Cache-Control разрешает кэшировать ответ клиентам
+    и nginx на REFERENCE_CACHE_MAX_AGE секунд.
+    """
+
+    version_models = ()
+
+    def get_validators(self, request):
+        if not hasattr(request, '_cache_validators'):
+            versions = get_versions(*self.version_models)
+            representation = hashlib.md5(
+                f'{request.get_full_path()}|'
+                f'{request.META.get("HTTP_ACCEPT", "")}'.encode()
+            ).hexdigest()[:16]
+            etag = '-'.join(
+                f'{label}.{version}'
+                for label, (version, _) in sorted(versions.items())
+            )
+            last_modified = datetime.fromtimestamp(
+                max(modified for _, modified in versions.values()),
+                tz=timezone.utc
+            )
+            request._cache_validators = (
+                f'{etag}-{representation}', last_modified
+            )
+        return request._cache_validators
+
+    def dispatch(self, request, *args, **kwargs):
+        response = condition(
+            etag_func=lambda request, *args, **kwargs:
+                self.get_validators(request)[0],
+            last_modified_func=lambda request, *args, **kwargs:
+                self.get_validators(request)[1],
+        )(super().dispatch)(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD') and response.status_code in (
+            200, 304
+        ):
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=settings.REFERENCE_CACHE_MAX_AGE
+            )
+        return response
+
+
+class ReplicaReadMixin:
+    """Безопасные запросы читают данные из реплики базы данных.
+
+    Пользователь, недавно изменявший данные, читает основную базу,
+    см. ReplicaPinMiddleware. Реплика выбирается после аутентификации
+    и действует до конца обработки запроса.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with reads_from(None):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and settings.DATABASE_REPLICAS
+            and not (
+                request.user.is_authenticated
+                and is_pinned(request.user.id)
+            )
+        ):
+            read_from_replica()
+
+
+class AnonymousCacheMixin:
+    """Кэш готовых ответов list и retrieve для анонимных пользователей.
+
+    Ключ строится из адреса, формата ответа и параметров
+    cache_query_params; запросы с другими параметрами не кэшируются.
+    Значения параметров cache_list_params сортируются без повторов,
+    у остальных учитывается последнее значение, как при фильтрации.
+    Вместе с ответом хранятся версии, от которых он зависит: моделей
+    из get_cache_version_models и объектов из
+    get_cache_dependency_versions, прочитанные до сборки ответа.
+    Ответ отдаётся из кэша, только пока они не изменились.
+    """
+
+    cache_query_params = ()
+    cache_list_params = ()
+
+    def get_cache_version_models(self):
+        return ()
+
+    def get_cache_dependency_versions(self):
+        """Версии объектов ответа, прочитанные до его сборки."""
+        return {}
+
+    def get_response_cache_key(self, request):
+        if (
+            request.method != 'GET'
+            or request.user.is_authenticated
+            or request.accepted_renderer.format != 'json'
+        ):
+            return None
+        params = []
+        for name in sorted(request.query_params):
+            if name not in self.cache_query_params:
+                return None
+            if name in self.cache_list_params:
+                value = sorted(set(filter(
+                    None, request.query_params.getlist(name)
+                )))
+            else:
+                value = request.query_params.get(name)
+            params.append((name, value))
+        key = (
+            f'{request.build_absolute_uri(request.path)}|'
+            f'{request.accepted_media_type}|{params}'
+        )
+        return RESPONSE_KEY.format(hashlib.md5(key.encode()).hexdigest())
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        if key is None:
+            return handler(request, *args, **kwargs)
+        response_cache = caches['responses']
+        entry = response_cache.get(key)
+        if entry is not None and (
+            get_label_versions(entry['versions']) == entry['versions']
+        ):
+            return HttpResponse(
+                entry['content'], content_type=entry['content_type']
+            )
+        versions = get_label_versions(
+            model_label(model) for model in self.get_cache_version_models()
+        )
+        with use_primary():
+            response = handler(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        versions.update(self.get_cache_dependency_versions())
+        renderer = request.accepted_renderer
+        content_type = request.accepted_media_type
+        content = renderer.render(
+            response.data, content_type, self.get_renderer_context()
+        )
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        entry = {
+            'versions': versions,
+            'content': content,
+            'content_type': content_type,
+        }
+        response_cache.set(key, entry)
+        return HttpResponse(entry['content'], content_type=content_type)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -1,8 +1,161 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    CursorPagination,
+    PageNumberPagination,
+    _reverse_ordering
+)
+
+
+class KeysetPagination(CursorPagination):
+    """Постраничный вывод по ключу без OFFSET и COUNT(*).
+
+    Порядок задаётся методом get_cursor_ordering или атрибутом
+    cursor_ordering view-класса. Курсор хранит значения всех полей
+    порядка, последнее поле должно быть уникальным, например id.
+    """
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        if hasattr(view, 'get_cursor_ordering'):
+            ordering = tuple(view.get_cursor_ordering())
+        else:
+            ordering = (getattr(view, 'cursor_ordering', self.ordering), )
+        name = ordering[-1].lstrip('-')
+        if name != 'pk' and not queryset.model._meta.get_field(name).unique:
+            raise ImproperlyConfigured(
+                f'Последнее поле порядка {ordering} должно быть уникальным'
+            )
+        return ordering
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+            len(position) != len(self.ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def filter_after(self, queryset, position, reverse):
+        """Строки после position в лексикографическом порядке полей."""
+        condition = Q()
+        equal = Q()
+        for order, value in zip(self.ordering, json.loads(position)):
+            name = order.lstrip('-')
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return queryset.filter(condition)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = self.filter_after(queryset, current_position, reverse)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        has_position = current_position is not None or offset > 0
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = has_position
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = has_position
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = [
+            instance[order.lstrip('-')] if isinstance(instance, dict)
+            else getattr(instance, order.lstrip('-'))
+            for order in ordering
+        ]
+        return json.dumps(values, default=str)
 
 
 class CustomPagination(PageNumberPagination):
-    """Класс формирования страниц в соответствии с ТЗ"""
+    """Класс формирования страниц в соответствии с ТЗ
+
+    По запросу с ?pagination=cursor или с параметром cursor
+    вместо номеров страниц используется KeysetPagination. Результаты
+    поиска (?search=) отсортированы по релевантности и всегда выводятся
+    по номерам страниц.
+    """
 
     page_size = 6
     page_size_query_param = 'page'
+    mode_query_param = 'pagination'
+    ranked_query_params = ('search', )
+    cursor_paginator = None
+
+    def is_cursor_mode(self, request):
+        if any(request.query_params.get(name, '').strip()
+               for name in self.ranked_query_params):
+            return False
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.is_cursor_mode(request):
+            self.cursor_paginator = KeysetPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RankedListPagination(PageNumberPagination):
+    """Постраничный вывод заранее отсортированной последовательности."""
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
@@ -0,0 +1,195 @@
+import csv
+from datetime import datetime
+
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ShoppingListNegotiation(DefaultContentNegotiation):
+    """Выбор формата списка покупок только по параметру ?format=.
+
+    Заголовок Accept игнорируется: без параметра отдаётся первый
+    рендерер (обычный текст), как и раньше.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format_query_param = self.settings.URL_FORMAT_OVERRIDE
+        format = format_suffix or request.query_params.get(format_query_param)
+        if format:
+            renderers = self.filter_renderers(renderers, format)
+        return renderers[0], renderers[0].media_type
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    Принимает итератор строк (название, единица измерения, количество)
+    и отдаёт документ частями, не собирая его целиком в памяти.
+    """
+
+    charset = 'utf-8'
+
+    def stream(self, rows):
+        raise NotImplementedError(
+            'ShoppingListRenderer.stream() must be implemented.'
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, (list, tuple)):
+            # Ошибки, например 401 или 404, отдаются в JSON.
+            response = (renderer_context or {}).get('response')
+            if response is not None:
+                response['Content-Type'] = 'application/json'
+            return JSONRenderer().render(data)
+        return b''.join(
+            chunk if isinstance(chunk, bytes) else chunk.encode('utf-8')
+            for chunk in self.stream(data)
+        )
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    """Список покупок в виде обычного текста."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        today = datetime.today()
+        yield (
+            f'Сегодня {today.day}/{today.month}/{today.year}\n'
+            f'В магазине необходимо купить:\n'
+        )
+        for name, measurement_unit, amount in rows:
+            yield f'\n - {name} ({measurement_unit}) - {amount}'
+        yield f'\n\n by FoodgramCollection {today.year}'
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    """Список покупок в формате CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for row in rows:
+            yield writer.writerow(row)
+
+
+def cyrillic_glyphs():
+    """Имена глифов кириллицы для байтов 0xC0-0xFF кодировки cp1251."""
+    glyphs = []
+    for first in (10017, 10065):
+        for index in range(32):
+            glyphs.append(f'/afii{first + index + (index >= 6)}')
+    return glyphs
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    """Список покупок в формате PDF.
+
+    Документ пишется постранично: каждая страница уходит клиенту сразу,
+    а дерево страниц и таблица xref дописываются в конце файла.
+    Используется встроенный шрифт Helvetica с кодировкой cp1251.
+    """
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    lines_per_page = 48
+    font_encoding = (
+        '<< /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+        '/Differences [168 /afii10023 184 /afii10071 192 '
+        + ' '.join(cyrillic_glyphs()) + '] >>'
+    )
+
+    def __init__(self):
+        self.offsets = []
+        self.position = 0
+
+    def write_object(self, number, body):
+        if len(self.offsets) < number:
+            self.offsets.extend([0] * (number - len(self.offsets)))
+        self.offsets[number - 1] = self.position
+        chunk = f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+        self.position += len(chunk)
+        return chunk
+
+    @staticmethod
+    def escape(text):
+        text = text.replace('\\', '\\\\').replace('(', '\\(')
+        return text.replace(')', '\\)').encode('cp1251', errors='replace')
+
+    def page_content(self, lines):
+        content = [b'BT /F1 11 Tf 14 TL 50 800 Td']
+        for line in lines:
+            content.append(b'(' + self.escape(line) + b") '")
+        content.append(b'ET')
+        content = b'\n'.join(content)
+        return (
+            f'<< /Length {len(content)} >>\nstream\n'.encode()
+            + content + b'\nendstream'
+        )
+
+    def lines(self, rows):
+        today = datetime.today()
+        yield f'Сегодня {today.day}/{today.month}/{today.year}'
+        yield 'В магазине необходимо купить:'
+        yield ''
+        for name, measurement_unit, amount in rows:
+            yield f' - {name} ({measurement_unit}) - {amount}'
+        yield ''
+        yield f'by FoodgramCollection {today.year}'
+
+    def stream(self, rows):
+        self.offsets, self.position = [], 0
+        header = b'%PDF-1.4\n'
+        self.position = len(header)
+        yield header
+        yield self.write_object(3, (
+            '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+            f'/Encoding {self.font_encoding} >>'
+        ).encode())
+        pages, page, number = [], [], 4
+        for line in self.lines(rows):
+            page.append(line)
+            if len(page) == self.lines_per_page:
+                yield from self.write_page(number, page, pages)
+                page, number = [], number + 2
+        if page or not pages:
+            yield from self.write_page(number, page, pages)
+        kids = ' '.join(f'{kid} 0 R' for kid in pages)
+        yield self.write_object(2, (
+            f'<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>'
+        ).encode())
+        yield self.write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        xref = [f'xref\n0 {len(self.offsets) + 1}\n0000000000 65535 f \n']
+        xref.extend(f'{offset:010d} 00000 n \n' for offset in self.offsets)
+        xref.append(
+            f'trailer\n<< /Size {len(self.offsets) + 1} /Root 1 0 R >>\n'
+            f'startxref\n{self.position}\n%%EOF\n'
+        )
+        yield ''.join(xref).encode()
+
+    def write_page(self, number, lines, pages):
+        pages.append(number + 1)
+        yield self.write_object(number, self.page_content(lines))
+        yield self.write_object(number + 1, (
+            '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {number} 0 R >>'
+        ).encode())
+
+
+SHOPPING_LIST_RENDERERS = (
+    ShoppingListTextRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListPDFRenderer,
+)
@@ -1,16 +1,147 @@
+from collections import Counter, OrderedDict
+
 from rest_framework import serializers
 from drf_extra_fields.fields import Base64ImageField
+from django.db import models, transaction
 from django.shortcuts import get_object_or_404
 
+from api.fragments import recipe_fragments, short_recipe_fragments
+from recipes.images import IMAGE_VARIANTS
+from recipes.pantry_index import recipe_ingredients_changed
+from recipes.user_state import ANONYMOUS_STATE, get_user_state
 from recipes.models import (
     Tag, Recipe, Ingredient,
-    IngredientToRecipe, ShoppingCart, Favorite
+    IngredientToRecipe, ShoppingCart, Favorite, ShoppingListItem
 )
-from users.models import User, Follow
+from users.models import User, Follow, UserStats
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework.serializers import SerializerMethodField
 
 
+def recipes_limit(request):
+    """Значение параметра recipes_limit или None, если он не задан."""
+    limit = request.query_params.get('recipes_limit')
+    if not limit:
+        return None
+    try:
+        return max(int(limit), 0)
+    except ValueError:
+        raise serializers.ValidationError(
+            {'recipes_limit': 'Ожидается целое число.'}
+        )
+
+
+def pantry_ingredients(request):
+    """id ингредиентов из параметра ingredients: списком или через запятую.
+    """
+    values = request.query_params.getlist('ingredients')
+    try:
+        ids = {
+            int(value)
+            for value in ','.join(values).split(',') if value.strip()
+        }
+    except ValueError:
+        raise serializers.ValidationError(
+            {'ingredients': 'Ожидаются целые числа.'}
+        )
+    if not ids:
+        raise serializers.ValidationError(
+            {'ingredients': 'Укажите хотя бы один ингредиент.'}
+        )
+    return ids
+
+
+def check_ids(ids, model, label):
+    """Проверяет переданные id на повторы и существование.
+
+    Повторы ищутся за один проход, а существование проверяется одним
+    запросом COUNT только по переданным id. Ошибка перечисляет все
+    неверные id сразу.
+    """
+    counts = Counter(ids)
+    errors = []
+    duplicates = sorted(
+        object_id for object_id, count in counts.items() if count > 1
+    )
+    if duplicates:
+        errors.append(
+            f'{label} повторяются: {", ".join(map(str, duplicates))}'
+        )
+    queryset = model.objects.filter(id__in=counts)
+    if queryset.count() != len(counts):
+        missing = sorted(
+            set(counts) - set(queryset.values_list('id', flat=True))
+        )
+        errors.append(
+            f'{label} не существуют: {", ".join(map(str, missing))}'
+        )
+    if errors:
+        raise serializers.ValidationError(errors)
+
+
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """Адреса копий изображения рецепта по размерам.
+
+    Пока копии не готовы, для всех размеров отдаётся исходное
+    изображение.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        names = recipe.image_variants or dict.fromkeys(
+            IMAGE_VARIANTS, recipe.image.name
+        )
+        request = self.context.get('request', None)
+        srcset = {}
+        for variant, name in names.items():
+            url = recipe.image.storage.url(name)
+            srcset[variant] = (
+                request.build_absolute_uri(url) if request else url
+            )
+        return srcset
+
+
+class FragmentListSerializer(serializers.ListSerializer):
+    """Фрагменты всех рецептов списка читаются одним обращением к кэшу."""
+
+    def to_representation(self, data):
+        recipes = list(
+            data.all() if isinstance(data, models.Manager) else data
+        )
+        self.child.fragments.load(recipes, self.context.get('request'))
+        return super().to_representation(recipes)
+
+
+class FragmentMixin:
+    """Представление рецепта из кэша фрагментов api.fragments.
+
+    В кэше хранится представление без данных пользователя, add_user_data
+    дополняет его при каждом ответе.
+    """
+
+    fragments = None
+
+    def add_user_data(self, recipe, data, state):
+        return data
+
+    def to_representation(self, recipe):
+        request = self.context.get('request', None)
+        fragment = self.fragments.get(recipe, request)
+        if fragment is None:
+            fragment = self.add_user_data(
+                recipe, super().to_representation(recipe), ANONYMOUS_STATE
+            )
+            self.fragments.save(recipe, request, fragment)
+        return self.add_user_data(
+            recipe, OrderedDict(fragment), get_user_state(request)
+        )
+
+
 class UserRegistrationSerializer(UserCreateSerializer):
     """Сериализатор для регистрации пользователей."""
 
@@ -45,13 +176,8 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request', None)
-        if request:
-            current_user = request.user
-        return Follow.objects.filter(
-            user=current_user.id,
-            author=obj.id
-        ).exists()
+        state = get_user_state(self.context.get('request', None))
+        return obj.id in state.follows
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -70,13 +196,17 @@ class TegSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
-class ShortResipeSerializer(serializers.ModelSerializer):
+class ShortResipeSerializer(FragmentMixin, serializers.ModelSerializer):
     """Сериализатор для упрощённого отображения рецептов."""
 
+    image_srcset = ImageSrcsetField()
+    fragments = short_recipe_fragments
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
+        list_serializer_class = FragmentListSerializer
 
 
 class ShoppingCartSerializer(ShortResipeSerializer):
@@ -97,6 +227,7 @@ class ShoppingCartSerializer(ShortResipeSerializer):
             )
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request', None)
         current_user = request.user
@@ -125,6 +256,7 @@ class FavoriteSerializer(ShortResipeSerializer):
             )
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request', None)
         current_user = request.user
@@ -160,7 +292,7 @@ class IngredientToRecipeSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(FragmentMixin, serializers.ModelSerializer):
     """Сериализатор для обработки данных рецептов."""
 
     tags = serializers.SerializerMethodField()
@@ -170,11 +302,14 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     )
     author = CustomUserSerializer(read_only=True)
     image = Base64ImageField()
+    image_srcset = ImageSrcsetField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    fragments = recipe_fragments
 
     class Meta:
         model = Recipe
+        list_serializer_class = FragmentListSerializer
         fields = (
             'id',
             'tags',
@@ -184,6 +319,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_srcset',
             'text',
             'cooking_time',
         )
@@ -195,36 +331,30 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     )
 
     def get_tags(self, obj):
-        return TegSerializer(
-            Tag.objects.filter(recipes=obj),
-            many=True
-        ).data
+        return TegSerializer(obj.tags.all(), many=True).data
+
+    def add_user_data(self, recipe, data, state):
+        data['author'] = OrderedDict(
+            data['author'], is_subscribed=recipe.author_id in state.follows
+        )
+        data['is_favorited'] = recipe.id in state.favorites
+        data['is_in_shopping_cart'] = recipe.id in state.cart
+        return data
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request', None)
-        if request:
-            current_user = request.user
-        return ShoppingCart.objects.filter(
-            user=current_user.id,
-            recipe=obj.id,
-        ).exists()
+        state = get_user_state(self.context.get('request', None))
+        return obj.id in state.cart
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request', None)
-        if request:
-            current_user = request.user
-        return Favorite.objects.filter(
-            user=current_user.id,
-            recipe=obj.id
-        ).exists()
+        state = get_user_state(self.context.get('request', None))
+        return obj.id in state.favorites
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания рецептов."""
 
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
+    tags = serializers.ListField(
+        child=serializers.IntegerField(min_value=1)
     )
     ingredients = IngredientToRecipeSerializer(
         many=True,
@@ -244,94 +374,113 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         )
 
     def validate_tags(self, data):
-        request = self.context.get('request', None)
-        tags_list = []
-        request_methods = ['POST', 'PATCH']
-        if request.method in request_methods:
-            if 'tags' in data:
-                tags = data['tags']
-                for tag in tags:
-                    if tag.id in tags_list:
-                        raise serializers.ValidationError(
-                            f'Тег {tag} повторяется'
-                        )
-                    tags_list.append(tag.id)
-                if len(tags_list) == 0:
-                    raise serializers.ValidationError(
-                        'Должен присутствовать хотя бы 1 тег!'
-                    )
-                all_tags = Tag.objects.all().values_list('id', flat=True)
-                if not set(tags_list).issubset(all_tags):
-                    raise serializers.ValidationError(
-                        f'Тега {tag} не существует!'
-                    )
+        if not data:
+            raise serializers.ValidationError(
+                'Должен присутствовать хотя бы 1 тег!'
+            )
+        check_ids(data, Tag, 'Теги')
         return data
 
     def validate_ingredients(self, data):
-        request = self.context.get('request', None)
-        ingredients_list = []
-        request_methods = ['POST', 'PATCH']
-        if request.method in request_methods:
-            if 'ingredienttorecipe' in data:
-                ingredients = data['ingredienttorecipe']
-                for ingredient in ingredients:
-                    ingredient = ingredient['ingredient'].get('id')
-                    if ingredient in ingredients_list:
-                        raise serializers.ValidationError(
-                            f'Ингредиент {ingredient} уже был добавлен!'
-                        )
-                    ingredients_list.append(ingredient)
-                all_ingredients = Ingredient.objects.all().values_list(
-                    'id', flat=True
-                )
-                if not set(ingredients_list).issubset(all_ingredients):
-                    raise serializers.ValidationError(
-                        'Указанного ингредиента не существует!'
-                    )
-                if len(ingredients_list) == 0:
-                    raise serializers.ValidationError(
-                        'Список ингредиентов не должен быть пустым!'
-                    )
+        if not data:
+            raise serializers.ValidationError(
+                'Список ингредиентов не должен быть пустым!'
+            )
+        check_ids(
+            [ingredient['ingredient']['id'] for ingredient in data],
+            Ingredient,
+            'Ингредиенты'
+        )
         return data
 
     @staticmethod
-    def create_ingredients(recipe, ingredients):
-        ingredient_liist = []
-        for ingredient_data in ingredients:
-            ingredient_obj = Ingredient.objects.get(
-                id=ingredient_data.get('ingredient')['id'])
-            ingredient_liist.append(
-                IngredientToRecipe(
-                    ingredient=ingredient_obj,
-                    amount=ingredient_data.get('amount'),
+    def save_ingredients(recipe, ingredients, existing=None):
+        """Приводит ингредиенты рецепта к переданному списку.
+
+        Существование ингредиентов проверено в validate_ingredients,
+        со связями рецепта они сравниваются по id: создаются, меняются
+        и удаляются только отличающиеся строки. Возвращает True, если
+        что-то изменилось.
+        """
+        amounts = {
+            ingredient_data['ingredient']['id']: ingredient_data['amount']
+            for ingredient_data in ingredients
+        }
+        to_create, to_update, to_delete = [], [], []
+        if existing is None:
+            existing = {}
+            for link in IngredientToRecipe.objects.filter(recipe=recipe):
+                if link.ingredient_id in existing:
+                    to_delete.append(link.pk)
+                else:
+                    existing[link.ingredient_id] = link
+        for ingredient_id, amount in amounts.items():
+            link = existing.get(ingredient_id)
+            if link is None:
+                to_create.append(IngredientToRecipe(
                     recipe=recipe,
-                )
-            )
-        IngredientToRecipe.objects.bulk_create(ingredient_liist)
+                    ingredient_id=ingredient_id,
+                    amount=amount
+                ))
+            elif link.amount != amount:
+                link.amount = amount
+                to_update.append(link)
+        to_delete.extend(
+            link.pk for ingredient_id, link in existing.items()
+            if ingredient_id not in amounts
+        )
+        IngredientToRecipe.objects.bulk_create(to_create)
+        IngredientToRecipe.objects.bulk_update(to_update, ('amount', ))
+        if to_delete:
+            IngredientToRecipe.objects.filter(pk__in=to_delete).delete()
+        return bool(to_create or to_update or to_delete)
 
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request', None)
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredienttorecipe')
         recipe = Recipe.objects.create(author=request.user, **validated_data)
         recipe.tags.set(tags)
-        self.create_ingredients(recipe, ingredients)
+        self.save_ingredients(recipe, ingredients, existing={})
+        Recipe.objects.filter(pk=recipe.pk).update_search_vector()
+        recipe_ingredients_changed([recipe.pk])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        IngredientToRecipe.objects.filter(recipe=instance).delete()
-        instance.tags.set(validated_data.pop('tags'))
-        ingredients = validated_data.pop('ingredienttorecipe')
-        self.create_ingredients(instance, ingredients)
-        return super().update(instance, validated_data)
+        if 'tags' in validated_data:
+            instance.tags.set(validated_data.pop('tags'))
+        if 'ingredienttorecipe' in validated_data and self.save_ingredients(
+            instance, validated_data.pop('ingredienttorecipe')
+        ):
+            ShoppingListItem.objects.rebuild_for_recipe(instance)
+            recipe_ingredients_changed([instance.pk])
+        instance = super().update(instance, validated_data)
+        Recipe.objects.filter(pk=instance.pk).update_search_vector()
+        return instance
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        instance = Recipe.objects.with_related().get(pk=instance.pk)
         return RecipeReadSerializer(instance, context={
-            'request': self.context.get('request')
+            'request': request
         }).data
 
 
+class RecipeCoverageSerializer(RecipeReadSerializer):
+    """Рецепт с долей имеющихся ингредиентов и числом недостающих.
+
+    Доля зависит от запроса, поэтому добавляется к фрагменту рецепта.
+    """
+
+    def to_representation(self, recipe):
+        data = super().to_representation(recipe)
+        data['coverage'] = recipe.coverage
+        data['missing'] = recipe.missing
+        return data
+
+
 class FollowSerializer(CustomUserSerializer):
     """Сериализатор для обработки данных ингредиентов."""
     recipes = serializers.SerializerMethodField(read_only=True)
@@ -360,16 +509,19 @@ class FollowSerializer(CustomUserSerializer):
         )
 
     def get_recipes(self, obj):
-        limit = self.context.get('request').query_params.get('recipes_limit')
-        if limit:
-            queryset = Recipe.objects.filter(
-                author=obj).order_by('-id')[:int(limit)]
-        else:
-            queryset = Recipe.objects.filter(author=obj)
+        queryset = getattr(obj, 'latest_recipes', None)
+        if queryset is None:
+            limit = recipes_limit(self.context.get('request'))
+            queryset = Recipe.objects.filter(author=obj).order_by('-id')
+            if limit is not None:
+                queryset = queryset[:limit]
         return ShortResipeSerializer(queryset, many=True).data
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+        try:
+            return obj.stats.recipes_count
+        except UserStats.DoesNotExist:
+            return Recipe.objects.filter(author=obj).count()
 
     def create(self, validated_data):
         request = self.context.get('request', None)
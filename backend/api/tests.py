@@ -0,0 +1,733 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api import views
+from api.filters import RECIPE_ORDERINGS
+
+from recipes.images import IMAGE_VARIANTS, build_variants
+from recipes.models import (
+    Ingredient,
+    IngredientToRecipe,
+    Recipe,
+    RecipeQuerySet,
+    ShoppingListItem,
+    Tag
+)
+from users.models import Follow, User, UserStats
+
+
+def clear_caches():
+    for alias in ('default', 'responses', 'fragments'):
+        caches[alias].clear()
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class APITestCase(TestCase):
+    """Пользователи, тег и ингредиент для запросов к API.
+
+    Загруженные файлы сохраняются во временный каталог.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+        cls.user, *cls.authors = [
+            User.objects.create_user(
+                username=f'user{index}',
+                email=f'user{index}@example.com',
+                password='password',
+                first_name='Имя',
+                last_name='Фамилия'
+            )
+            for index in range(7)
+        ]
+
+    def setUp(self):
+        clear_caches()
+        self.anonymous = APIClient()
+        self.authorized = APIClient()
+        self.authorized.force_authenticate(self.user)
+
+    def create_recipes(self, count):
+        """Добавляет рецептов, пока их не станет count."""
+        for index in range(Recipe.objects.count(), count):
+            recipe = Recipe.objects.create(
+                author=self.authors[index % len(self.authors)],
+                name=f'Рецепт {index}',
+                image='api/recipe.png',
+                text='Описание',
+                cooking_time=10
+            )
+            recipe.tags.add(self.tag)
+            IngredientToRecipe.objects.create(
+                recipe=recipe, ingredient=self.ingredient, amount=100
+            )
+
+    def count_queries(self, client, url):
+        """Число запросов к базе данных для url с пустыми кэшами."""
+        clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+
+class RecipeListQueriesTest(APITestCase):
+    """Список рецептов загружается постоянным числом запросов."""
+
+    def assert_constant_queries(self, client, expected):
+        for count in (2, 6):
+            self.create_recipes(count)
+            with self.subTest(recipes=count):
+                self.assertEqual(
+                    self.count_queries(client, '/api/recipes/'), expected
+                )
+
+    def test_anonymous(self):
+        # COUNT, страница рецептов с авторами, теги, ингредиенты.
+        self.assert_constant_queries(self.anonymous, 4)
+
+    def test_authorized(self):
+        # Те же запросы, избранное, корзина и подписки пользователя.
+        self.assert_constant_queries(self.authorized, 7)
+
+
+class UserStateCacheTest(APITestCase):
+    """Избранное, корзина и подписки пользователя берутся из кэша."""
+
+    def get_recipes(self):
+        # Кэш ответов и фрагментов сбрасывается, кэш пользователя - нет.
+        for alias in ('responses', 'fragments'):
+            caches[alias].clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized.get('/api/recipes/')
+        return response.json()['results'], len(queries)
+
+    def test_cached_state(self):
+        self.create_recipes(2)
+        recipe = Recipe.objects.order_by('id').first()
+        _, cold = self.get_recipes()
+        results, warm = self.get_recipes()
+        # Три запроса состояния пользователя сэкономлены.
+        self.assertEqual(cold - warm, 3)
+        self.assertFalse(any(item['is_favorited'] for item in results))
+        self.authorized.post(f'/api/recipes/{recipe.id}/favorite/')
+        results, _ = self.get_recipes()
+        self.assertEqual(
+            [item['id'] for item in results if item['is_favorited']],
+            [recipe.id]
+        )
+
+
+class SubscriptionsQueriesTest(APITestCase):
+    """Подписки загружаются постоянным числом запросов."""
+
+    def test_no_follows(self):
+        for mode in ('page', 'cursor'):
+            with self.subTest(pagination=mode):
+                response = self.authorized.get(
+                    '/api/users/subscriptions/',
+                    {'recipes_limit': 3, 'pagination': mode}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['results'], [])
+
+    def test_subscriptions(self):
+        self.create_recipes(12)
+        for count in (2, 6):
+            for author in self.authors[:count]:
+                Follow.objects.get_or_create(user=self.user, author=author)
+            with self.subTest(follows=count):
+                # COUNT, страница авторов, подписки пользователя,
+                # последние рецепты авторов.
+                self.assertEqual(self.count_queries(
+                    self.authorized,
+                    '/api/users/subscriptions/?recipes_limit=2'
+                ), 4)
+                # Без COUNT в режиме cursor.
+                self.assertEqual(self.count_queries(
+                    self.authorized,
+                    '/api/users/subscriptions/?recipes_limit=2'
+                    '&pagination=cursor'
+                ), 3)
+
+
+class KeysetPaginationTest(APITestCase):
+    """Лента в режиме cursor проходится без повторов и пропусков,
+    в том числе при равных значениях первого поля порядка.
+    """
+
+    def walk(self, url, params, link='next'):
+        ids = []
+        response = self.anonymous.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids.extend(item['id'] for item in data['results'])
+            if data[link] is None:
+                return ids
+            response = self.anonymous.get(data[link])
+
+    def test_page_boundaries(self):
+        self.create_recipes(14)
+        expected = list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True)
+        )
+        for limit in (1, 4, 7, 14):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.walk(
+                    '/api/recipes/', {'pagination': 'cursor', 'limit': limit}
+                ), expected)
+
+    def test_recipe_feeds(self):
+        self.create_recipes(14)
+        # Равные счётчики по обе стороны границ страниц.
+        for index, recipe in enumerate(Recipe.objects.order_by('id')):
+            Recipe.objects.filter(pk=recipe.pk).update(
+                favorites_count=index % 3, trending_score=index // 5
+            )
+        for ordering in RECIPE_ORDERINGS:
+            expected = list(Recipe.objects.order_by(
+                *RECIPE_ORDERINGS[ordering]
+            ).values_list('id', flat=True))
+            with self.subTest(ordering=ordering):
+                self.assertEqual(self.walk('/api/recipes/', {
+                    'pagination': 'cursor', 'limit': 4, 'ordering': ordering
+                }), expected)
+
+    def test_previous_pages(self):
+        self.create_recipes(14)
+        Recipe.objects.update(favorites_count=1)
+        params = {'pagination': 'cursor', 'limit': 4, 'ordering': 'popular'}
+        data = self.anonymous.get('/api/recipes/', params).json()
+        while data['next'] is not None:
+            last = data
+            data = self.anonymous.get(data['next']).json()
+        ids = self.walk(last['next'], {}, link='previous')
+        # Первая загруженная страница - последняя в ленте.
+        expected = list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True)
+        )
+        self.assertCountEqual(ids, expected)
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_users(self):
+        ids = self.walk('/api/users/', {'pagination': 'cursor', 'limit': 3})
+        self.assertEqual(
+            ids, list(User.objects.order_by('id').values_list('id', flat=True))
+        )
+
+
+class RecipeSearchTest(APITestCase):
+    """Поиск рецептов по названию и ингредиентам.
+
+    Вне PostgreSQL слова ищутся через icontains без ранжирования.
+    """
+
+    def search(self, text, **params):
+        response = self.anonymous.get(
+            '/api/recipes/', {'search': text, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_mode_keeps_order(self):
+        self.create_recipes(8)
+        expected = list(Recipe.objects.search('мука').order_by(
+            '-id'
+        ).values_list('id', flat=True))[:6]
+        for params in ({}, {'pagination': 'cursor'}, {'cursor': 'x'}):
+            with self.subTest(params=params):
+                data = self.search('мука', **params)
+                # Поиск выводится по номерам страниц.
+                self.assertEqual(data['count'], 8)
+                self.assertEqual(
+                    [item['id'] for item in data['results']], expected
+                )
+
+    def test_deleted_ingredient(self):
+        self.create_recipes(2)
+        recipe_ids = set(Recipe.objects.values_list('id', flat=True))
+        with mock.patch.object(
+            RecipeQuerySet, 'update_search_vector', autospec=True
+        ) as update_search_vector:
+            self.ingredient.delete()
+        queryset, = update_search_vector.call_args[0]
+        self.assertEqual(
+            set(queryset.values_list('id', flat=True)), recipe_ids
+        )
+        self.assertEqual(self.search('мука')['results'], [])
+
+
+class RecipeIngredientsUpdateTest(APITestCase):
+    """Изменение ингредиентов рецепта его автором."""
+
+    def update(self, ingredients):
+        recipe = Recipe.objects.get()
+        client = APIClient()
+        client.force_authenticate(recipe.author)
+        return client.patch(
+            f'/api/recipes/{recipe.id}/',
+            {'ingredients': ingredients},
+            format='json'
+        )
+
+    def test_update(self):
+        self.create_recipes(1)
+        other = Ingredient.objects.create(name='соль', measurement_unit='г')
+        response = self.update([
+            {'id': self.ingredient.id, 'amount': 200},
+            {'id': other.id, 'amount': 5},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            dict(IngredientToRecipe.objects.values_list(
+                'ingredient', 'amount'
+            )),
+            {self.ingredient.id: 200, other.id: 5}
+        )
+
+    def test_unknown_ingredient(self):
+        self.create_recipes(1)
+        response = self.update([{'id': self.ingredient.id + 100, 'amount': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            list(IngredientToRecipe.objects.values_list('amount', flat=True)),
+            [100]
+        )
+
+
+class ShoppingListTest(APITestCase):
+    """Список покупок следует за корзиной пользователя."""
+
+    def get_amount(self):
+        return ShoppingListItem.objects.filter(
+            user=self.user, ingredient=self.ingredient
+        ).values_list('amount', flat=True).first()
+
+    def test_cart_changes(self):
+        self.create_recipes(2)
+        first, second = Recipe.objects.order_by('id')
+        for recipe in (first, second):
+            response = self.authorized.post(
+                f'/api/recipes/{recipe.id}/shopping_cart/'
+            )
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_amount(), 200)
+        self.authorized.delete(f'/api/recipes/{first.id}/shopping_cart/')
+        self.assertEqual(self.get_amount(), 100)
+        self.authorized.delete(f'/api/recipes/{second.id}/shopping_cart/')
+        self.assertIsNone(self.get_amount())
+
+    def test_existing_item(self):
+        # Позицию уже вставил параллельный запрос.
+        self.create_recipes(1)
+        ShoppingListItem.objects.create(
+            user=self.user, ingredient=self.ingredient, amount=0
+        )
+        ShoppingListItem.objects.add_recipe(
+            self.user.id, Recipe.objects.get().id
+        )
+        self.assertEqual(self.get_amount(), 100)
+
+
+class ShoppingListDownloadTest(APITestCase):
+    """Выгрузка списка покупок в txt, csv и pdf."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_recipes(1)
+        self.authorized.post(
+            f'/api/recipes/{Recipe.objects.get().id}/shopping_cart/'
+        )
+
+    def download(self, client, file_format):
+        return client.get(
+            '/api/recipes/download_shopping_cart/', {'format': file_format}
+        )
+
+    def test_formats(self):
+        for file_format, content_type, expected in (
+            ('txt', 'text/plain; charset=utf-8', 'мука (г) - 100'.encode()),
+            ('csv', 'text/csv; charset=utf-8', 'мука,г,100'.encode()),
+            ('pdf', 'application/pdf', b'%PDF-1.4'),
+        ):
+            with self.subTest(format=file_format):
+                response = self.download(self.authorized, file_format)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], content_type)
+                self.assertIn(expected, b''.join(response.streaming_content))
+
+    def test_error_is_json(self):
+        for file_format in ('txt', 'csv', 'pdf'):
+            with self.subTest(format=file_format):
+                response = self.download(self.anonymous, file_format)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertIn('detail', response.json())
+
+
+class RecipeResponseCacheTest(APITestCase):
+    """Закэшированные ответы сбрасываются при изменении ингредиентов
+    рецепта, например в админ. панели.
+    """
+
+    def get_amounts(self, client, url):
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        recipe = data['results'][0] if 'results' in data else data
+        return [item['amount'] for item in recipe['ingredients']]
+
+    def assert_amounts(self, client, amounts):
+        recipe = Recipe.objects.get()
+        for url in ('/api/recipes/', f'/api/recipes/{recipe.id}/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.get_amounts(client, url), amounts)
+
+    def check_ingredient_changes(self, client):
+        self.create_recipes(1)
+        self.assert_amounts(client, [100])
+        link = IngredientToRecipe.objects.get()
+        link.amount = 1234
+        link.save()
+        self.assert_amounts(client, [1234])
+        link.delete()
+        self.assert_amounts(client, [])
+
+    def test_change_while_building(self):
+        # Рецепт изменён после чтения версий, но до сборки ответа.
+        self.create_recipes(1)
+        load_recipes = views.load_recipes
+
+        def load_and_change(recipes, request):
+            load_recipes(recipes, request)
+            link = IngredientToRecipe.objects.get()
+            link.amount = 1234
+            link.save()
+
+        with mock.patch.object(views, 'load_recipes', load_and_change):
+            self.get_amounts(self.anonymous, '/api/recipes/')
+        self.assertEqual(
+            self.get_amounts(self.anonymous, '/api/recipes/'), [1234]
+        )
+
+    def test_cache_key_params(self):
+        self.create_recipes(2)
+        first, second = [
+            recipe.author_id for recipe in Recipe.objects.order_by('id')
+        ]
+        # Фильтр автора учитывает последнее значение параметра.
+        for authors in ((first, second), (second, first)):
+            with self.subTest(author=authors):
+                response = self.anonymous.get(
+                    '/api/recipes/', {'author': authors}
+                )
+                self.assertEqual(
+                    [item['author']['id'] for item in response.json()[
+                        'results'
+                    ]],
+                    [authors[-1]]
+                )
+
+    def test_anonymous(self):
+        self.check_ingredient_changes(self.anonymous)
+
+    def test_authorized(self):
+        # Ответ собирается из закэшированных фрагментов рецептов.
+        self.check_ingredient_changes(self.authorized)
+
+
+@override_settings(
+    DATABASE_ROUTERS=['backend.routers.ReplicaRouter'],
+    DATABASE_REPLICAS=['replica']
+)
+class ReplicaRoutingTest(TransactionTestCase):
+    """Безопасные запросы читают реплику, пока пользователь
+    не изменил данные.
+    """
+
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        # Реплика - вторая база-зеркало тестовой базы.
+        connections.databases['replica'] = dict(
+            connections.databases['default'], TEST={'MIRROR': 'default'}
+        )
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(
+            username='user', email='user@example.com', password='password'
+        )
+        # Изображение без файла: копии после фиксации не создаются.
+        with mock.patch('recipes.signals.schedule_variants'):
+            self.recipe = Recipe.objects.create(
+                author=self.user, name='Рецепт', image='api/recipe.png',
+                text='Описание', cooking_time=10
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_reads(self, url):
+        """Число запросов к основной базе и к реплике."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(primary), len(replica)
+
+    def test_pinned_after_write(self):
+        primary, replica = self.count_reads('/api/recipes/')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.id}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201)
+        primary, replica = self.count_reads('/api/recipes/')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    @override_settings(DATABASE_ROUTERS=[], DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        with mock.patch('api.mixins.is_pinned') as is_pinned:
+            self.assertEqual(self.count_reads('/api/recipes/')[1], 0)
+        is_pinned.assert_not_called()
+
+
+class ReferenceHTTPCacheTest(APITestCase):
+    """Справочники отдаются с ETag, повторный запрос получает 304,
+    пока справочник не изменился.
+    """
+
+    def check_conditional_get(self, url, change):
+        response = self.anonymous.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        etag = response['ETag']
+        response = self.anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        change()
+        response = self.anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_tags(self):
+        def change():
+            self.tag.name = 'Обед'
+            self.tag.save()
+
+        self.check_conditional_get('/api/tags/', change)
+
+    def test_ingredients(self):
+        def change():
+            Ingredient.objects.create(name='соль', measurement_unit='г')
+
+        self.check_conditional_get('/api/ingredients/?name=му', change)
+
+
+class LoadDataTest(TestCase):
+    """Повторная загрузка справочников не создаёт дубликатов."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as data_file:
+            data_file.write(text)
+        return path
+
+    def load(self, tags):
+        call_command(
+            'load_data',
+            ingredients=self.write(
+                'ingredients.csv',
+                'name,measurement_unit\nмука,г\nсоль,г\nмука,кг\n'
+            ),
+            tags=self.write(
+                'tags.csv', f'name_tag,tag_slug,color\n{tags}'
+            ),
+            batch_size=2,
+            stdout=StringIO()
+        )
+
+    def test_repeated_load(self):
+        self.load('Завтрак,breakfast,#E26C2D\n')
+        self.load('Утро,breakfast,#49B64E\nОбед,lunch,#8775D2\n')
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list(
+                'name', 'measurement_unit'
+            )),
+            [('мука', 'г'), ('мука', 'кг'), ('соль', 'г')]
+        )
+        self.assertEqual(
+            sorted(Tag.objects.values_list('slug', 'name', 'color')),
+            [('breakfast', 'Утро', '#49B64E'), ('lunch', 'Обед', '#8775D2')]
+        )
+
+
+class CountersTest(APITestCase):
+    """Счётчики избранного, корзины и рецептов автора."""
+
+    def get_counters(self):
+        recipe = Recipe.objects.get()
+        return (
+            recipe.favorites_count,
+            recipe.cart_count,
+            UserStats.objects.get(user=recipe.author).recipes_count
+        )
+
+    def test_counters(self):
+        self.create_recipes(1)
+        recipe = Recipe.objects.get()
+        self.assertEqual(self.get_counters(), (0, 0, 1))
+        for path in ('favorite', 'shopping_cart'):
+            self.authorized.post(f'/api/recipes/{recipe.id}/{path}/')
+        self.assertEqual(self.get_counters(), (1, 1, 1))
+        self.authorized.delete(f'/api/recipes/{recipe.id}/favorite/')
+        self.assertEqual(self.get_counters(), (0, 1, 1))
+
+    def test_recount(self):
+        self.create_recipes(1)
+        recipe = Recipe.objects.get()
+        self.authorized.post(f'/api/recipes/{recipe.id}/favorite/')
+        Recipe.objects.update(favorites_count=5, cart_count=3)
+        UserStats.objects.update(recipes_count=0)
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(self.get_counters(), (1, 0, 1))
+
+
+class ImageVariantsTest(APITestCase):
+    """Уменьшенные копии изображения рецепта."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_recipes(1)
+        self.recipe = Recipe.objects.get()
+        image = BytesIO()
+        Image.new('RGB', (2000, 1000), '#E26C2D').save(image, 'PNG')
+        self.recipe.image.save('recipe.png', ContentFile(image.getvalue()))
+
+    def get_srcset(self):
+        response = self.anonymous.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['image_srcset']
+
+    def test_variants(self):
+        # Пока копий нет, для всех размеров отдаётся исходное изображение.
+        self.assertEqual(
+            set(self.get_srcset().values()),
+            {f'http://testserver{self.recipe.image.url}'}
+        )
+        self.assertTrue(build_variants(self.recipe.id, self.recipe.image.name))
+        self.recipe.refresh_from_db()
+        storage = self.recipe.image.storage
+        for variant, name in self.recipe.image_variants.items():
+            with self.subTest(variant=variant):
+                with Image.open(storage.path(name)) as image:
+                    self.assertEqual(image.width, IMAGE_VARIANTS[variant])
+        srcset = self.get_srcset()
+        self.assertEqual(srcset.keys(), IMAGE_VARIANTS.keys())
+        self.assertNotIn(self.recipe.image.url, srcset.values())
+
+    def test_replaced_image(self):
+        # Изображение заменили, пока шла обработка прежнего.
+        self.assertFalse(build_variants(self.recipe.id, 'recipes/old.png'))
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants_format, '')
+
+
+class PantryTest(APITestCase):
+    """Подбор рецептов по имеющимся ингредиентам."""
+
+    def test_by_ingredients(self):
+        salt, sugar = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'сахар')
+        ]
+        self.create_recipes(4)
+        first, second, third, fourth = Recipe.objects.order_by('id')
+        for recipe, ingredients in (
+            (second, [salt]), (third, [salt, sugar]), (fourth, [sugar])
+        ):
+            for ingredient in ingredients:
+                IngredientToRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+        IngredientToRecipe.objects.filter(
+            recipe=fourth, ingredient=self.ingredient
+        ).delete()
+        response = self.anonymous.get(
+            '/api/recipes/by_ingredients/',
+            {'ingredients': f'{self.ingredient.id},{salt.id}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [
+                (item['id'], item['coverage'], item['missing'])
+                for item in response.json()['results']
+            ],
+            [
+                (second.id, 1.0, 0),
+                (first.id, 1.0, 0),
+                (third.id, 0.6667, 1),
+            ]
+        )
+
+    def test_no_ingredients(self):
+        response = self.anonymous.get('/api/recipes/by_ingredients/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ingredients', response.json())
+
+
+class QueryPlansTest(TestCase):
+    """Запросы основных endpoint'ов не сортируют строки в базе данных
+    сверх ALLOWED_SORTS команды explain_api.
+    """
+
+    def test_no_unexpected_sorts(self):
+        call_command(
+            'generate_data', users=20, recipes=60, follows=3, favorites=5,
+            carts=2, stdout=StringIO()
+        )
+        try:
+            call_command('explain_api', check=True, stdout=StringIO())
+        except CommandError as error:
+            self.fail(str(error))
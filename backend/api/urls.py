@@ -3,12 +3,14 @@ from rest_framework import routers
 
 from api.views import (
     CustomUserViewSet,
+    DatabaseStatsView,
     FollowListViewSet,
     FollowDestroyCreateViewSet,
     TagListRetrieveViewSet,
     IngredientViewSet,
     RecipeViewSet,
     FavoriteDestroyCreateViewSet,
+    RequestStatsView,
     ShoppingCartDestroyCreateViewSet
 )
 
@@ -47,5 +49,7 @@ router.register(
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    path('stats/', RequestStatsView.as_view(), name='stats'),
+    path('stats/db/', DatabaseStatsView.as_view(), name='stats-db'),
     path('', include(router.urls)),
 ]
@@ -1,11 +1,10 @@
-from datetime import datetime
-from django.db.models import Sum
-from django.http.response import HttpResponse
+from django.db import connections
+from django.db.models import Prefetch
+from django.db.models import prefetch_related_objects
+from django.http.response import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import (
-    filters,
     serializers,
     mixins,
     status,
@@ -14,17 +13,30 @@ from rest_framework import (
 )
 from rest_framework.decorators import action
 from rest_framework.response import Response
-
-from api.filters import MyFilterSet, IngredientFilter
-from api.pagination import CustomPagination
+from rest_framework.views import APIView
+
+from api.fragments import load_recipes, recipe_fragments
+from api.filters import MyFilterSet, IngredientFilter, RECIPE_ORDERINGS
+from api.middleware import request_stats
+from api.mixins import (
+    AnonymousCacheMixin,
+    ReplicaReadMixin,
+    VersionedCacheMixin
+)
+from api.pagination import CustomPagination, RankedListPagination
+from api.renderers import SHOPPING_LIST_RENDERERS, ShoppingListNegotiation
 from api.permissions import IsAuthorOrReadOnly
+from backend.db_pool.pool import pool_stats
 from api.serializers import (
+    recipes_limit,
     RecipeCreateSerializer,
     ShoppingCartSerializer,
     FavoriteSerializer,
     IngredientSerializer,
     TegSerializer,
     RecipeReadSerializer,
+    RecipeCoverageSerializer,
+    pantry_ingredients,
     FollowSerializer
 )
 from recipes.models import (
@@ -33,28 +45,54 @@ from recipes.models import (
     ShoppingCart,
     Favorite,
     Ingredient,
-    IngredientToRecipe
+    ShoppingListItem
 )
+from recipes.ingredient_index import ingredient_index
+from recipes.pantry_index import pantry_index
 from users.models import User, Follow
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(ReplicaReadMixin, UserViewSet):
     """Пользовательский view-класс."""
 
     pagination_class = CustomPagination
+    cursor_ordering = 'id'
 
     def get_queryset(self):
         return User.objects.all()
 
 
-class FollowListViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+class FollowListViewSet(
+    ReplicaReadMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet
+):
     """View-класс для отображения списка модели Follow."""
 
     serializer_class = FollowSerializer
     pagination_class = CustomPagination
 
     def get_queryset(self):
-        return User.objects.filter(following__user=self.request.user)
+        return User.objects.filter(
+            following__user=self.request.user
+        ).select_related('stats').order_by('-following__id')
+
+    def paginate_queryset(self, queryset):
+        """Подгружает последние рецепты авторов страницы одним запросом."""
+        page = super().paginate_queryset(queryset)
+        if not page:
+            return page
+        prefetch_related_objects(page, Prefetch(
+            'recipes',
+            queryset=Recipe.objects.latest_by_author(
+                page, recipes_limit(self.request)
+            ).only(
+                'id', 'name', 'image', 'image_variants_format',
+                'cooking_time', 'author_id'
+            ),
+            to_attr='latest_recipes'
+        ))
+        return page
 
 
 class FollowDestroyCreateViewSet(
@@ -81,14 +119,26 @@ class FollowDestroyCreateViewSet(
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    ReplicaReadMixin,
+    VersionedCacheMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     """View-класс для отображения ингредиента или списка ингредиентов."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
-    filter_backends = (IngredientFilter, )
-    search_fields = ('^name', )
+    filter_backends = ()
+    authentication_classes = ()
+    version_models = (Ingredient, )
+
+    def list(self, request, *args, **kwargs):
+        """Поиск по индексу в памяти: сначала совпадения по началу
+        названия, затем по вхождению подстроки.
+        """
+        return Response(ingredient_index.search(
+            request.query_params.get(IngredientFilter.search_param, '')
+        ))
 
 
 class ShoppingCartDestroyCreateViewSet(
@@ -142,6 +192,8 @@ class FavoriteDestroyCreateViewSet(
 
 
 class TagListRetrieveViewSet(
+    ReplicaReadMixin,
+    VersionedCacheMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     viewsets.GenericViewSet
@@ -150,9 +202,15 @@ class TagListRetrieveViewSet(
 
     queryset = Tag.objects.all()
     serializer_class = TegSerializer
+    authentication_classes = ()
+    version_models = (Tag, )
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ReplicaReadMixin,
+    AnonymousCacheMixin,
+    viewsets.ModelViewSet
+):
     """View-класс для отображения и создания рецептов."""
 
     permission_classes = (IsAuthorOrReadOnly, )
@@ -160,33 +218,144 @@ class RecipeViewSet(viewsets.ModelViewSet):
     serializer_class = RecipeCreateSerializer
     filter_class = MyFilterSet
     pagination_class = CustomPagination
+    cache_query_params = (
+        'page', 'pagination', 'cursor', 'limit', 'tags', 'author'
+    )
+    cache_list_params = ('tags', )
+    loaded_recipes = ()
+
+    def get_cache_version_models(self):
+        """Список зависит от состава рецептов, детальная страница -
+        только от самого рецепта и справочников.
+        """
+        if self.action == 'list':
+            return (Recipe, Tag, Ingredient)
+        return (Tag, Ingredient)
+
+    def get_cache_dependency_versions(self):
+        """Версии рецептов и авторов ответа, прочитанные при загрузке
+        фрагментов, то есть до сборки ответа.
+        """
+        versions = {}
+        for recipe in self.loaded_recipes:
+            versions.update(recipe_fragments.versions(recipe))
+        return versions
+
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return Recipe.objects.with_author()
+        return Recipe.objects.with_related()
+
+    def get_object(self):
+        recipe = super().get_object()
+        if self.action == 'retrieve':
+            self.loaded_recipes = [recipe]
+            load_recipes(self.loaded_recipes, self.request)
+        return recipe
+
+    def paginate_queryset(self, queryset):
+        """Теги и ингредиенты страницы загружаются пачкой."""
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.action == 'list':
+            self.loaded_recipes = page
+            load_recipes(page, self.request)
+        return page
+
+    def get_cursor_ordering(self):
+        return RECIPE_ORDERINGS.get(
+            self.request.query_params.get('ordering'), ('-id', )
+        )
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeReadSerializer
         return RecipeCreateSerializer
 
-    @action(detail=False, methods=['GET'])
+    @action(
+        detail=False,
+        methods=['GET'],
+        filter_backends=(),
+        pagination_class=RankedListPagination
+    )
+    def by_ingredients(self, request):
+        """Подбор рецептов по имеющимся ингредиентам.
+
+        Сначала идут рецепты с наибольшей долей имеющихся ингредиентов,
+        при равной доле - с меньшим числом недостающих.
+        """
+        page = self.paginate_queryset(
+            pantry_index.search(pantry_ingredients(request))
+        )
+        recipes = Recipe.objects.with_author().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        results = []
+        for recipe_id, hits, size in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.coverage = round(hits / size, 4)
+            recipe.missing = size - hits
+            results.append(recipe)
+        load_recipes(results, request)
+        serializer = RecipeCoverageSerializer(
+            results, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(permissions.IsAuthenticated, ),
+        renderer_classes=SHOPPING_LIST_RENDERERS,
+        content_negotiation_class=ShoppingListNegotiation
+    )
     def download_shopping_cart(self, request):
-        """Скачивание товаров из корзины."""
-        ingredients = IngredientToRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).order_by('ingredient__name').values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        today = datetime.today()
-        shopping_cart = (
-            f'Сегодня {today.day}/{today.month}/{today.year}\n'
-            f'В магазине необходимо купить:\n'
+        """Скачивание товаров из корзины в формате txt, csv или pdf."""
+        renderer = request.accepted_renderer
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
+        ).order_by('ingredient__name').values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        ).iterator()
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients), content_type=content_type
         )
-        for ingredient in ingredients:
-            shopping_cart += (
-                f"\n - {ingredient['ingredient__name']} "
-                f"({ingredient['ingredient__measurement_unit']})"
-                f" - {ingredient['amount']}")
-        shopping_cart += f'\n\n by FoodgramCollection {today.year}'
-        filename = f'{request.user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_cart, content_type='text/plain')
+        filename = f'{request.user.username}_shopping_list.{renderer.format}'
         response['Content-Disposition'] = \
-            f'attachment; filename="{filename}.txt"'
+            f'attachment; filename="{filename}"'
         return response
+
+
+class RequestStatsView(APIView):
+    """Перцентили числа запросов и времени ответа по endpoint'ам.
+
+    Данные собираются RequestStatsMiddleware отдельно в каждом процессе.
+    """
+
+    permission_classes = (permissions.IsAdminUser, )
+
+    def get(self, request):
+        return Response(request_stats.snapshot())
+
+
+class DatabaseStatsView(APIView):
+    """Соединения с базами данных и метрики пулов текущего процесса."""
+
+    permission_classes = (permissions.IsAdminUser, )
+
+    def get(self, request):
+        pools = pool_stats()
+        return Response({
+            alias: {
+                'engine': connections[alias].settings_dict['ENGINE'],
+                'conn_max_age': connections[alias].settings_dict[
+                    'CONN_MAX_AGE'
+                ],
+                'pool': pools.get(alias),
+            }
+            for alias in connections
+        })
@@ -3,14 +3,16 @@ ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
-For more information on this file, see
-https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+Django 2.2 has no ASGI handler of its own, so the WSGI application is
+wrapped with asgiref: every request runs in a thread of the asgiref
+executor (its size is set by the ASGI_THREADS environment variable).
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+from asgiref.wsgi import WsgiToAsgi
+from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+application = WsgiToAsgi(get_wsgi_application())
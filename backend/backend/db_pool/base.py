@@ -0,0 +1,43 @@
+from functools import partial
+
+from django.db.backends.postgresql import base
+from psycopg2 import Error
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from backend.db_pool.pool import PooledConnectionMixin
+
+
+class DatabaseWrapper(PooledConnectionMixin, base.DatabaseWrapper):
+    """PostgreSQL с пулом соединений процесса.
+
+    close() возвращает соединение в пул, поэтому при CONN_MAX_AGE = 0
+    каждый запрос берёт готовое соединение, а общее их число
+    ограничено POOL['MAX_SIZE'] на процесс.
+    """
+
+    def get_new_connection(self, conn_params):
+        connection = self.acquire_pooled(
+            partial(super().get_new_connection, conn_params)
+        )
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def check_pooled(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except Error:
+            return False
+        return True
+
+    def reset_pooled(self, connection):
+        if connection.closed:
+            return False
+        try:
+            if connection.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except Error:
+            return False
+        return connection.get_transaction_status() == TRANSACTION_STATUS_IDLE
@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+
+COUNTERS = ('checkouts', 'waits', 'timeouts', 'created', 'connect_errors',
+            'failed_checks', 'discarded')
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    """За время ожидания в пуле не освободилось ни одного соединения."""
+
+
+class ConnectionPool:
+    """Пул соединений с базой данных внутри процесса.
+
+    Соединение выдаётся из свободных, а если их нет и в пуле меньше
+    max_size соединений - создаётся новое. Иначе поток ждёт
+    освобождения не дольше timeout секунд. Соединение, пролежавшее
+    свободным дольше check_after секунд, перед выдачей проверяется
+    функцией check и при ошибке закрывается.
+    """
+
+    def __init__(self, max_size, timeout, check_after, check, window=1000):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.check = check
+        self.pid = os.getpid()
+        self._condition = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self._in_use = 0
+        self._counters = Counter()
+        self._checkout_ms = deque(maxlen=window)
+
+    def _reserve(self, deadline):
+        """Свободное соединение и время его возврата в пул.
+
+        (None, None) означает, что место в пуле занято под новое
+        соединение, которое нужно создать.
+        """
+        with self._condition:
+            if not self._idle and self._size >= self.max_size:
+                self._counters['waits'] += 1
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'Все {self.max_size} соединений пула заняты '
+                        f'дольше {self.timeout} с'
+                    )
+                self._condition.wait(remaining)
+            self._in_use += 1
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+            return None, None
+
+    def _count(self, counter):
+        with self._condition:
+            self._counters[counter] += 1
+
+    def _forget(self, connection, counter='discarded'):
+        with self._condition:
+            self._size -= 1
+            self._in_use -= 1
+            self._counters[counter] += 1
+            self._condition.notify()
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def acquire(self, connect):
+        """Соединение из пула; connect() создаёт новое соединение."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            connection, released = self._reserve(deadline)
+            if connection is None:
+                try:
+                    connection = connect()
+                except Exception:
+                    self._forget(None, 'connect_errors')
+                    raise
+                self._count('created')
+            elif (
+                time.monotonic() - released >= self.check_after
+                and not self.check(connection)
+            ):
+                self._forget(connection, 'failed_checks')
+                continue
+            with self._condition:
+                self._counters['checkouts'] += 1
+                self._checkout_ms.append((time.monotonic() - start) * 1000)
+            return connection
+
+    def release(self, connection, reusable=True):
+        """Возвращает соединение в пул или закрывает его."""
+        if not reusable:
+            self._forget(connection)
+            return
+        with self._condition:
+            self._in_use -= 1
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            timings = sorted(self._checkout_ms)
+            report = {
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+            }
+            report.update(
+                (name, self._counters[name]) for name in COUNTERS
+            )
+        report['checkout_ms'] = {
+            f'p{percent}': round(
+                timings[min(len(timings) - 1, len(timings) * percent // 100)],
+                2
+            )
+            for percent in (50, 95, 99)
+        } if timings else None
+        return report
+
+
+def get_pool(alias, factory):
+    """Пул базы данных alias в текущем процессе.
+
+    После fork рабочего процесса создаётся новый пул: соединения
+    родителя нельзя использовать из потомка.
+    """
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            pool = _pools[alias] = factory()
+        return pool
+
+
+def pool_stats():
+    """Метрики пулов текущего процесса по псевдонимам баз данных."""
+    with _pools_lock:
+        pools = {
+            alias: pool for alias, pool in _pools.items()
+            if pool.pid == os.getpid()
+        }
+    return {alias: pool.stats() for alias, pool in pools.items()}
+
+
+class PooledConnectionMixin:
+    """Берёт соединения DatabaseWrapper из пула и возвращает их туда.
+
+    Настройки - в ключе POOL настроек базы данных: MAX_SIZE, TIMEOUT
+    и CHECK_AFTER. Движок реализует check_pooled и reset_pooled.
+    """
+
+    pool_defaults = {'MAX_SIZE': 10, 'TIMEOUT': 5, 'CHECK_AFTER': 30}
+
+    @property
+    def pool(self):
+        options = dict(
+            self.pool_defaults, **self.settings_dict.get('POOL', {})
+        )
+        return get_pool(self.alias, lambda: ConnectionPool(
+            max_size=options['MAX_SIZE'],
+            timeout=options['TIMEOUT'],
+            check_after=options['CHECK_AFTER'],
+            check=self.check_pooled
+        ))
+
+    def acquire_pooled(self, connect):
+        try:
+            return self.pool.acquire(connect)
+        except PoolTimeout as error:
+            raise self.Database.OperationalError(str(error)) from error
+
+    def _close(self):
+        if self.connection is not None:
+            self.pool.release(
+                self.connection, self.reset_pooled(self.connection)
+            )
+
+    def check_pooled(self, connection):
+        """Проверка свободного соединения перед выдачей из пула."""
+        raise NotImplementedError
+
+    def reset_pooled(self, connection):
+        """Готовит соединение к возврату в пул; False - закрыть его."""
+        raise NotImplementedError
@@ -0,0 +1,80 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_KEY = 'db-pin:{}'
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def choose_replica():
+    """Случайная реплика или None, если реплики не настроены."""
+    if not settings.DATABASE_REPLICAS:
+        return None
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def reads_from(alias):
+    """Направляет чтение в базу alias; None - в основную базу."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def read_from_replica():
+    """Чтение из случайной реплики до конца ближайшего reads_from."""
+    _read_alias.set(choose_replica())
+
+
+def reads_replica():
+    """Направлено ли сейчас чтение в реплику."""
+    return _read_alias.get() is not None
+
+
+def use_primary():
+    """Чтение из основной базы, например для данных, которые кэшируются
+    под новой версией и не должны отставать от неё.
+    """
+    return reads_from(None)
+
+
+def pin_to_primary(user_id):
+    """После записи пользователь какое-то время читает основную базу,
+    чтобы видеть свои изменения, пока реплики их догоняют.
+    """
+    cache.set(PIN_KEY.format(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return bool(cache.get(PIN_KEY.format(user_id)))
+
+
+class ReplicaRouter:
+    """Чтение - из реплики, выбранной для запроса, запись - в основную базу.
+
+    Реплика используется только внутри reads_from(): её выбирает
+    ReplicaReadMixin для безопасных запросов. Внутри транзакции
+    чтение всегда идёт в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
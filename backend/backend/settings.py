@@ -36,6 +36,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.RequestStatsMiddleware',
+    'api.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,10 +75,139 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        # Сколько секунд соединение переживает запрос; 0 - закрывается
+        # после каждого запроса. Постоянное соединение держит каждый
+        # поток, поэтому соединений с базой до GUNICORN_WORKERS *
+        # GUNICORN_THREADS, и это число должно быть меньше
+        # max_connections PostgreSQL.
+        # С движком backend.db_pool соединений не больше
+        # GUNICORN_WORKERS * POOL['MAX_SIZE'] при любом CONN_MAX_AGE
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=0)),
+        # Пул соединений движка backend.db_pool
+        'POOL': {
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', default=10)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', default=5)),
+            'CHECK_AFTER': float(
+                os.getenv('DB_POOL_CHECK_AFTER', default=30)
+            ),
+        },
     }
 }
 
+# Реплики только для чтения: адреса серверов через запятую, для SQLite -
+# пути к файлам. Остальные настройки берутся из основной базы
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', default='').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = dict(
+        DATABASES['default'],
+        **{
+            'NAME' if 'sqlite' in (os.getenv('DB_ENGINE') or '')
+            else 'HOST': replica.strip()
+        },
+        TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = (
+    ['backend.routers.ReplicaRouter'] if DATABASE_REPLICAS else []
+)
+
+# Сколько секунд после записи пользователь читает основную базу
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', default=10))
+
+
+# Cache
+# В кэше default хранятся версии моделей, рецептов и авторов. По ним
+# сбрасываются кэши responses и fragments, HTTP-кэш справочников
+# и индексы ингредиентов в памяти процессов. По умолчанию кэш хранится
+# в памяти процесса. Если процессов сервера несколько, нужен общий кэш,
+# иначе остальные процессы не узнают об изменениях и будут отдавать
+# устаревшие данные. Например, memcached:
+# CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache,
+# CACHE_LOCATION=memcached:11211 (см. infra/docker-compose.yml)
+# Реплика может отставать от версий, поэтому данные, прочитанные из неё,
+# в кэши не записываются, а ответ для кэша responses собирается
+# по основной базе.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+        # Здесь хранятся версии каждого рецепта и автора: ограничения
+        # Django по умолчанию в 300 записей для них мало
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', default=50000)),
+        },
+    },
+    # Готовые ответы для анонимных пользователей, см.
+    # api.mixins.AnonymousCacheMixin. RESPONSE_CACHE_TIMEOUT ограничивает
+    # срок жизни ответа, если версию не удалось увеличить. Для
+    # отключения - DummyCache
+    'responses': {
+        'BACKEND': os.getenv(
+            'RESPONSE_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', default='responses'),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=600)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                os.getenv('RESPONSE_CACHE_MAX_ENTRIES', default=5000)
+            ),
+        },
+    },
+    # Представления рецептов без данных пользователя, см. api.fragments
+    'fragments': {
+        'BACKEND': os.getenv(
+            'FRAGMENT_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('FRAGMENT_CACHE_LOCATION', default='fragments'),
+        'TIMEOUT': int(os.getenv('RECIPE_FRAGMENT_TIMEOUT', default=3600)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', default=20000)
+            ),
+        },
+    },
+}
+
+# Время хранения справочников (теги, ингредиенты) в HTTP-кэше, секунды
+REFERENCE_CACHE_MAX_AGE = int(os.getenv('REFERENCE_CACHE_MAX_AGE', default=60))
+
+
+# Время жизни кэша избранного, корзины и подписок пользователя
+USER_STATE_TIMEOUT = int(os.getenv('USER_STATE_TIMEOUT', default=3600))
+
+# Лента ?ordering=trending: окно, период полураспада и вес корзины
+TRENDING_WINDOW_DAYS = int(os.getenv('TRENDING_WINDOW_DAYS', default=14))
+
+TRENDING_HALF_LIFE_DAYS = float(
+    os.getenv('TRENDING_HALF_LIFE_DAYS', default=3)
+)
+
+TRENDING_CART_WEIGHT = float(os.getenv('TRENDING_CART_WEIGHT', default=0.5))
+
+# Конфигурация полнотекстового поиска рецептов в PostgreSQL
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', default='russian')
+
+
+# Замеры SQL-запросов и времени ответа по endpoint'ам
+REQUEST_STATS_ENABLED = os.getenv(
+    'REQUEST_STATS_ENABLED', default='False'
+) == 'True'
+
+REQUEST_STATS_SAMPLE_RATE = float(
+    os.getenv('REQUEST_STATS_SAMPLE_RATE', default=1.0)
+)
+
+REQUEST_STATS_WINDOW = int(os.getenv('REQUEST_STATS_WINDOW', default=1000))
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -114,6 +245,13 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Уменьшенные копии изображений рецептов создаются в пуле потоков
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+
+IMAGE_VARIANTS_EAGER = os.getenv(
+    'IMAGE_VARIANTS_EAGER', default='False'
+) == 'True'
+
 
 # Rest Framework settings
 REST_FRAMEWORK = {
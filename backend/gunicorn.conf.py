@@ -0,0 +1,34 @@
+"""Настройки gunicorn.
+
+SERVER_MODE=wsgi (по умолчанию) запускает backend.wsgi, SERVER_MODE=asgi -
+backend.asgi в процессах uvicorn. По умолчанию работает один процесс
+sync. GUNICORN_THREADS больше 1 включает потоки gthread: медленный
+запрос занимает один поток, а не весь процесс.
+
+Несколько процессов (GUNICORN_WORKERS) требуют общего кэша, см. CACHES
+в settings.
+"""
+import os
+
+PROCESS_LOCAL_CACHES = ('', 'django.core.cache.backends.locmem.LocMemCache')
+
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = os.getenv('GUNICORN_BIND', '0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+keepalive = 5
+
+if workers > 1 and os.getenv('CACHE_BACKEND', '') in PROCESS_LOCAL_CACHES:
+    raise SystemExit(
+        'GUNICORN_WORKERS больше 1 требует общего кэша: '
+        'укажите CACHE_BACKEND, например memcached'
+    )
+
+if SERVER_MODE == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornH11Worker'
+elif threads > 1:
+    worker_class = 'gthread'
+else:
+    worker_class = 'sync'
@@ -1,16 +1,26 @@
 from django.contrib import admin
 
 from backend.settings import EMPTY_FIELD_VALUE
+from recipes.pantry_index import recipe_ingredients_changed
 from recipes.models import (
     Tag,
     Ingredient,
     Recipe,
     IngredientToRecipe,
     Favorite,
-    ShoppingCart
+    ShoppingCart,
+    ShoppingListItem
 )
 
 
+def refresh_recipes(recipes):
+    """Пересчитывает списки покупок, поиск и индекс ингредиентов."""
+    for recipe in recipes:
+        ShoppingListItem.objects.rebuild_for_recipe(recipe)
+    Recipe.objects.filter(pk__in=recipes).update_search_vector()
+    recipe_ingredients_changed(recipes)
+
+
 class IngredientInline(admin.TabularInline):
     """Встроенное представление
     для редактирования ингредиентов в админ. панели.
@@ -26,8 +36,11 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'author',
         'name',
-        'cooking_time'
+        'cooking_time',
+        'favorites_count',
+        'cart_count'
     )
+    readonly_fields = ('favorites_count', 'cart_count')
     search_fields = (
         'author__username',
         'author__email',
@@ -36,6 +49,10 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('tags',)
     inlines = (IngredientInline,)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_recipes([form.instance.pk])
+
 
 class TegAdmin(admin.ModelAdmin):
     """Настройки админ. панели для модели тегов."""
@@ -72,6 +89,19 @@ class IngredientToRecipeAdmin(admin.ModelAdmin):
     list_filter = ('recipe__tags',)
     empty_value_display = EMPTY_FIELD_VALUE
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_recipes([obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_recipes([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipes = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        refresh_recipes(recipes)
+
 
 class FavoriteAdmin(admin.ModelAdmin):
     """Настройки админ. панели для модели избранных рецептов."""
@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, features
+
+from recipes.versions import bump_label, object_label
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1280,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variants_format():
+    """Формат уменьшенных копий: WebP, если Pillow его поддерживает."""
+    if features.check('webp'):
+        return 'webp'
+    return 'jpg'
+
+
+def variant_name(image_name, variant, extension):
+    """Путь уменьшенной копии рядом с исходным изображением."""
+    directory, filename = os.path.split(image_name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(
+        directory, 'variants', f'{stem}_{variant}.{extension}'
+    )
+
+
+def variant_names(image_name, extension):
+    return {
+        variant: variant_name(image_name, variant, extension)
+        for variant in IMAGE_VARIANTS
+    }
+
+
+def render_variant(image, width, extension):
+    copy = image.copy()
+    copy.thumbnail((width, width * 4), Image.LANCZOS)
+    buffer = BytesIO()
+    if extension == 'webp':
+        copy.save(buffer, 'WEBP', quality=80, method=4)
+    else:
+        copy.convert('RGB').save(
+            buffer, 'JPEG', quality=80, optimize=True, progressive=True
+        )
+    return buffer.getvalue()
+
+
+def build_variants(recipe_id, image_name):
+    """Создаёт уменьшенные копии изображения рецепта.
+
+    Если пока шла обработка изображение рецепта заменили, результат
+    не записывается: для нового изображения запущена своя обработка.
+    """
+    from recipes.models import Recipe
+
+    recipe = Recipe.objects.filter(pk=recipe_id, image=image_name).first()
+    if recipe is None:
+        return False
+    extension = variants_format()
+    storage = recipe.image.storage
+    with recipe.image.open('rb'):
+        image = Image.open(recipe.image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    for variant, name in variant_names(image_name, extension).items():
+        content = render_variant(image, IMAGE_VARIANTS[variant], extension)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(content))
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=image_name
+    ).update(image_variants_format=extension)
+    if updated:
+        bump_label(object_label(Recipe, recipe_id))
+    return bool(updated)
+
+
+def run_build_variants(recipe_id, image_name):
+    """Задача пула: ошибки пишутся в лог, соединения с БД закрываются."""
+    try:
+        build_variants(recipe_id, image_name)
+    except Exception:
+        logger.exception(
+            'Не удалось обработать изображение рецепта %s', recipe_id
+        )
+    finally:
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS,
+                thread_name_prefix='recipe-images'
+            )
+        return _executor
+
+
+def schedule_variants(recipe):
+    """Ставит обработку изображения в пул после фиксации транзакции.
+
+    При IMAGE_VARIANTS_EAGER копии создаются сразу в текущем потоке.
+    """
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    if settings.IMAGE_VARIANTS_EAGER:
+        transaction.on_commit(
+            lambda: build_variants(recipe_id, image_name)
+        )
+        return
+    transaction.on_commit(lambda: get_executor().submit(
+        run_build_variants, recipe_id, image_name
+    ))
+
+
+def delete_variants(image_name, extension, storage):
+    for name in variant_names(image_name, extension).values():
+        storage.delete(name)
@@ -0,0 +1,67 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+from backend.routers import use_primary
+from recipes.models import Ingredient
+from recipes.versions import get_version
+
+MAX_CHAR = chr(0x10FFFF)
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Ищет по началу названия бинарным поиском, затем по вхождению
+    подстроки; перестраивается при смене версии модели Ingredient.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    def build(self):
+        entries = sorted(
+            (name.casefold(), pk, {
+                'id': pk,
+                'name': name,
+                'measurement_unit': measurement_unit,
+            })
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator()
+        )
+        keys = [key for key, _, _ in entries]
+        items = [item for _, _, item in entries]
+        return keys, items
+
+    def _get_data(self):
+        version = get_version(Ingredient)
+        data = self._data
+        if data is None or data[0] != version:
+            with self._lock:
+                data = self._data
+                if data is None or data[0] != version:
+                    # Реплика может отставать от версии.
+                    with use_primary():
+                        data = self._data = (version, *self.build())
+        return data
+
+    def search(self, query):
+        """Ингредиенты, начинающиеся с query, затем содержащие его."""
+        _, keys, items = self._get_data()
+        query = query.casefold()
+        if not query:
+            return list(items)
+        start = bisect_left(keys, query)
+        end = bisect_right(keys, query + MAX_CHAR, lo=start)
+        matches = items[start:end]
+        for part in (slice(None, start), slice(end, None)):
+            matches.extend(
+                item
+                for key, item in zip(keys[part], items[part])
+                if query in key
+            )
+        return matches
+
+
+ingredient_index = IngredientIndex()
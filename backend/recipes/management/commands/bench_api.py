@@ -0,0 +1,200 @@
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.models import Count
+from rest_framework.test import APIClient
+
+from api.middleware import QueryTimer
+from recipes.management.commands.bench_ingredient_search import percentile
+from recipes.models import Ingredient, Recipe, ShoppingCart, Tag
+from users.models import Follow, User
+
+
+def consume(response):
+    """Дочитывает ответ, в том числе потоковый, до конца."""
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+class Command(BaseCommand):
+    """Замеры основных endpoint'ов API через тестовый клиент.
+
+    Для каждого сценария считаются SQL-запросы на один запрос, p50 и p95
+    времени ответа и пик памяти Python. Результат сохраняется в JSON
+    и может сравниваться с сохранённым ранее базовым замером.
+    Данные готовятся командой generate_data.
+    """
+    help = 'Замерить основные endpoint\'ы API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Количество запросов в каждом сценарии'
+        )
+        parser.add_argument(
+            '--output', help='Файл для сохранения результатов в JSON'
+        )
+        parser.add_argument(
+            '--compare', help='JSON-файл с базовым замером для сравнения'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=None,
+            help='Допустимое ухудшение p50 в процентах; при превышении '
+                 'или росте числа запросов команда завершается с ошибкой'
+        )
+        parser.add_argument(
+            '--label', default='', help='Метка замера, например хеш коммита'
+        )
+        parser.add_argument(
+            '--close-connections', action='store_true',
+            help='После каждого запроса закрывать соединения, как это '
+                 'делает сервер: при CONN_MAX_AGE = 0 каждый запрос '
+                 'открывает новое соединение'
+        )
+
+    def scenarios(self):
+        """Сценарии: имя, адреса запросов и нужна ли авторизация."""
+        user = User.objects.filter(
+            id__in=Follow.objects.values('user')
+        ).filter(
+            id__in=ShoppingCart.objects.values('user')
+        ).order_by('id').first()
+        recipe = Recipe.objects.order_by('-favorites_count', 'id').first()
+        if user is None or recipe is None:
+            raise CommandError('Нет данных, выполните generate_data.')
+        tags = list(Tag.objects.order_by('id').values_list('slug', flat=True))
+        author = Recipe.objects.values('author').annotate(
+            total=Count('id')
+        ).order_by('-total').values_list('author', flat=True).first()
+        prefixes = [
+            name[:3] for name in Ingredient.objects.order_by(
+                'id'
+            ).values_list('name', flat=True)[:20]
+        ]
+        return user, (
+            ('recipes_list', ['/api/recipes/'], False),
+            ('recipes_list_auth', ['/api/recipes/'], True),
+            ('recipes_filter_tags', [
+                '/api/recipes/?' + '&'.join(f'tags={tag}' for tag in tags[:2])
+            ], True),
+            ('recipes_filter_author', [
+                f'/api/recipes/?author={author}'
+            ], True),
+            ('recipes_favorited', ['/api/recipes/?is_favorited=1'], True),
+            ('recipes_cursor', ['/api/recipes/?pagination=cursor'], True),
+            ('recipe_detail', [f'/api/recipes/{recipe.id}/'], True),
+            ('recipe_detail_anon', [f'/api/recipes/{recipe.id}/'], False),
+            ('subscriptions', [
+                '/api/users/subscriptions/?recipes_limit=3'
+            ], True),
+            ('shopping_list', [
+                '/api/recipes/download_shopping_cart/?format=txt'
+            ], True),
+            ('ingredient_search', [
+                f'/api/ingredients/?name={prefix}' for prefix in prefixes
+            ], False),
+        )
+
+    def run_scenario(self, client, urls, iterations, close_connections):
+        for url in urls:
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: статус {response.status_code}')
+            consume(response)
+        timings, queries = [], []
+        for index in range(iterations):
+            if close_connections:
+                close_old_connections()
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                start = time.perf_counter()
+                consume(client.get(urls[index % len(urls)]))
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(timer.count)
+        tracemalloc.start()
+        consume(client.get(urls[0]))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {
+            'queries': max(queries),
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должен быть больше 0')
+        user, scenarios = self.scenarios()
+        anonymous = APIClient(SERVER_NAME='localhost')
+        authorized = APIClient(SERVER_NAME='localhost')
+        authorized.force_authenticate(user)
+        results = {}
+        for name, urls, auth in scenarios:
+            results[name] = self.run_scenario(
+                authorized if auth else anonymous, urls,
+                options['iterations'], options['close_connections']
+            )
+        report = {
+            'label': options['label'],
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'vendor': connection.vendor,
+            'engine': connection.settings_dict['ENGINE'],
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'close_connections': options['close_connections'],
+            'iterations': options['iterations'],
+            'data': {
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+            },
+            'results': results,
+        }
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)['results']
+        regressions = self.print_report(
+            results, baseline, options['threshold']
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+        if regressions:
+            raise CommandError(
+                'Ухудшение относительно базового замера: '
+                + ', '.join(regressions)
+            )
+
+    def print_report(self, results, baseline, threshold):
+        self.stdout.write(
+            'сценарий              | запросов | p50, мс | p95, мс | '
+            'пик, КиБ | p50 к базе'
+        )
+        regressions = []
+        for name, result in results.items():
+            line = (
+                f'{name:21} | {result["queries"]:8} | '
+                f'{result["p50_ms"]:7.2f} | {result["p95_ms"]:7.2f} | '
+                f'{result["peak_kib"]:8.0f}'
+            )
+            base = (baseline or {}).get(name)
+            if base:
+                change = (
+                    result['p50_ms'] / max(base['p50_ms'], 1e-6) - 1
+                ) * 100
+                line += f' | {change:+6.1f}%'
+                if result['queries'] != base['queries']:
+                    line += f' (запросов было {base["queries"]})'
+                if threshold is not None and (
+                    change > threshold or result['queries'] > base['queries']
+                ):
+                    regressions.append(name)
+            self.stdout.write(line)
+        return regressions
@@ -0,0 +1,83 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import mixins
+from rest_framework.test import APIRequestFactory
+
+from api.filters import IngredientFilter
+from api.views import IngredientViewSet
+from recipes.models import Ingredient
+
+
+class LegacyIngredientViewSet(IngredientViewSet):
+    """Прежний поиск: SearchFilter с запросом LIKE 'x%' к базе."""
+
+    filter_backends = (IngredientFilter, )
+    search_fields = ('^name', )
+    list = mixins.ListModelMixin.list
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class Command(BaseCommand):
+    """Сравнение задержки поиска ингредиентов по базе и по индексу.
+
+    Имитирует автодополнение: для случайных названий отправляет запрос
+    на каждый набранный символ.
+    """
+    help = 'Сравнить задержку поиска ингредиентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--words', type=int, default=50,
+            help='Количество названий, набираемых по буквам'
+        )
+        parser.add_argument(
+            '--max-length', type=int, default=8,
+            help='Максимальная длина набираемого префикса'
+        )
+
+    def run(self, view, queries):
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        view(factory.get('/api/ingredients/', {'name': queries[0]}))
+        timings = []
+        with CaptureQueriesContext(connection) as context:
+            for query in queries:
+                request = factory.get('/api/ingredients/', {'name': query})
+                start = time.perf_counter()
+                view(request).render()
+                timings.append((time.perf_counter() - start) * 1000)
+        return timings, len(context.captured_queries)
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stderr.write('Нет ингредиентов, выполните load_data.')
+            return
+        queries = [
+            name[:length]
+            for name in random.sample(names, min(options['words'], len(names)))
+            for length in range(1, min(len(name), options['max_length']) + 1)
+        ]
+        self.stdout.write(
+            f'Ингредиентов: {len(names)}, запросов: {len(queries)}'
+        )
+        self.stdout.write('реализация | p50, мс | p95, мс | SQL-запросов')
+        for name, view_class in (
+            ('LIKE', LegacyIngredientViewSet),
+            ('индекс', IngredientViewSet),
+        ):
+            timings, query_count = self.run(
+                view_class.as_view({'get': 'list'}), queries
+            )
+            self.stdout.write(
+                f'{name:10} | {statistics.median(timings):7.2f} | '
+                f'{percentile(timings, 95):7.2f} | {query_count}'
+            )
@@ -0,0 +1,131 @@
+import json
+import statistics
+import threading
+import time
+from datetime import datetime
+from http.client import HTTPConnection, HTTPException
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.management.commands.bench_ingredient_search import percentile
+
+
+class Client(threading.Thread):
+    """Поток нагрузки: запросы по кругу через одно keep-alive соединение."""
+
+    def __init__(self, host, port, paths, headers, start, deadline):
+        super().__init__(daemon=True)
+        self.host, self.port = host, port
+        self.paths, self.headers = paths, headers
+        self.start_event, self.deadline = start, deadline
+        self.timings, self.errors = [], 0
+
+    def run(self):
+        connection = HTTPConnection(self.host, self.port, timeout=60)
+        self.start_event.wait()
+        index = 0
+        while time.perf_counter() < self.deadline[0]:
+            path = self.paths[index % len(self.paths)]
+            index += 1
+            start = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=self.headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, HTTPException):
+                self.errors += 1
+                connection.close()
+                continue
+            if response.status != 200:
+                self.errors += 1
+                continue
+            self.timings.append((time.perf_counter() - start) * 1000)
+        connection.close()
+
+
+class Command(BaseCommand):
+    """Нагрузочный замер запущенного сервера.
+
+    concurrency потоков держат по соединению и в течение duration секунд
+    запрашивают адреса по кругу. Используется для сравнения режимов
+    SERVER_MODE и настроек gunicorn при одинаковой нагрузке.
+    """
+    help = 'Замерить пропускную способность запущенного сервера'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://localhost:8000',
+            help='Адрес сервера'
+        )
+        parser.add_argument(
+            '--path', action='append', default=[],
+            help='Адрес запроса, можно указать несколько раз; '
+                 'по умолчанию /api/recipes/'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=200,
+            help='Количество одновременных соединений'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=20,
+            help='Длительность замера в секундах'
+        )
+        parser.add_argument(
+            '--token', help='Токен авторизации пользователя'
+        )
+        parser.add_argument(
+            '--label', default='', help='Метка замера, например режим сервера'
+        )
+        parser.add_argument(
+            '--output', help='Файл для сохранения результатов в JSON'
+        )
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['duration'] <= 0:
+            raise CommandError(
+                '--concurrency и --duration должны быть больше 0'
+            )
+        url = urlsplit(options['url'])
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        start, deadline = threading.Event(), [0.0]
+        clients = [
+            Client(
+                url.hostname, url.port or 80,
+                options['path'] or ['/api/recipes/'], headers, start, deadline
+            )
+            for _ in range(options['concurrency'])
+        ]
+        for client in clients:
+            client.start()
+        deadline[0] = time.perf_counter() + options['duration']
+        began = time.perf_counter()
+        start.set()
+        for client in clients:
+            client.join()
+        elapsed = time.perf_counter() - began
+        timings = [value for client in clients for value in client.timings]
+        if not timings:
+            raise CommandError('Ни один запрос не выполнен успешно')
+        report = {
+            'label': options['label'],
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'concurrency': options['concurrency'],
+            'requests': len(timings),
+            'errors': sum(client.errors for client in clients),
+            'rps': round(len(timings) / elapsed, 1),
+            'p50_ms': round(statistics.median(timings), 1),
+            'p95_ms': round(percentile(timings, 95), 1),
+            'p99_ms': round(percentile(timings, 99), 1),
+        }
+        self.stdout.write(
+            f'{report["label"] or options["url"]}: '
+            f'{report["rps"]} запросов/с, ошибок {report["errors"]}, '
+            f'p50 {report["p50_ms"]} мс, p95 {report["p95_ms"]} мс, '
+            f'p99 {report["p99_ms"]} мс'
+        )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
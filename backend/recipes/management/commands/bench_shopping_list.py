@@ -0,0 +1,157 @@
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.http.response import HttpResponse
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Ingredient,
+    IngredientToRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem
+)
+
+User = get_user_model()
+
+
+def legacy_shopping_cart(user):
+    """Прежняя выгрузка: агрегация и сборка всего текста в памяти."""
+    ingredients = IngredientToRecipe.objects.filter(
+        recipe__shopping_cart__user=user
+    ).order_by('ingredient__name').values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(amount=Sum('amount'))
+    today = datetime.today()
+    shopping_cart = (
+        f'Сегодня {today.day}/{today.month}/{today.year}\n'
+        f'В магазине необходимо купить:\n'
+    )
+    for ingredient in ingredients:
+        shopping_cart += (
+            f"\n - {ingredient['ingredient__name']} "
+            f"({ingredient['ingredient__measurement_unit']})"
+            f" - {ingredient['amount']}")
+    shopping_cart += f'\n\n by FoodgramCollection {today.year}'
+    return HttpResponse(shopping_cart, content_type='text/plain')
+
+
+def measure(get_chunks):
+    """Время до первого байта, общее время и пик памяти Python."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = iter(get_chunks())
+    next(chunks, None)
+    first_byte = time.perf_counter() - start
+    for _ in chunks:
+        pass
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first_byte * 1000, total * 1000, peak / 1024
+
+
+class Command(BaseCommand):
+    """Сравнение прежней и потоковой выгрузки списка покупок.
+
+    Данные создаются во временной транзакции и откатываются после замеров.
+    Пик памяти считается через tracemalloc, так как RSS процесса
+    не уменьшается между замерами.
+    """
+    help = 'Сравнить выгрузку списка покупок для корзин разного размера'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10, 100, 1000],
+            help='Количество рецептов в корзине'
+        )
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, default=10,
+            help='Количество ингредиентов в одном рецепте'
+        )
+        parser.add_argument(
+            '--format', default='txt', choices=('txt', 'csv', 'pdf'),
+            help='Формат потоковой выгрузки'
+        )
+
+    def create_recipes(self, author, count, per_recipe):
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        if len(ingredients) < per_recipe:
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'bench {index}', measurement_unit='г')
+                for index in range(per_recipe)
+            )
+            ingredients = list(
+                Ingredient.objects.values_list('id', flat=True)
+            )
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f'bench recipe {index}',
+                text='bench',
+                cooking_time=1
+            )
+            for index in range(count)
+        )
+        recipes = list(Recipe.objects.filter(author=author).values_list(
+            'id', flat=True
+        ))
+        IngredientToRecipe.objects.bulk_create(
+            IngredientToRecipe(
+                recipe_id=recipe,
+                ingredient_id=ingredient,
+                amount=random.randint(1, 500)
+            )
+            for recipe in recipes
+            for ingredient in random.sample(ingredients, per_recipe)
+        )
+        return recipes
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['sizes'])
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username='bench_shopping_list',
+                email='bench_shopping_list@foodgram.ru'
+            )
+            recipes = self.create_recipes(
+                user, sizes[-1], options['ingredients_per_recipe']
+            )
+            client = APIClient(SERVER_NAME='localhost')
+            client.force_authenticate(user)
+            url = (
+                '/api/recipes/download_shopping_cart/'
+                f'?format={options["format"]}'
+            )
+            b''.join(client.get(url).streaming_content)
+            self.stdout.write(
+                'рецептов | реализация | TTFB, мс | всего, мс | пик, КиБ'
+            )
+            carted = 0
+            for size in sizes:
+                ShoppingCart.objects.bulk_create(
+                    ShoppingCart(user=user, recipe_id=recipe)
+                    for recipe in recipes[carted:size]
+                )
+                carted = size
+                ShoppingListItem.objects.rebuild([user.id])
+                results = (
+                    ('прежняя', measure(
+                        lambda: [legacy_shopping_cart(user).content]
+                    )),
+                    ('потоковая', measure(
+                        lambda: client.get(url).streaming_content
+                    )),
+                )
+                for name, (first_byte, total, peak) in results:
+                    self.stdout.write(
+                        f'{size:8} | {name:10} | {first_byte:8.1f} | '
+                        f'{total:9.1f} | {peak:8.0f}'
+                    )
+            transaction.set_rollback(True)
@@ -0,0 +1,109 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIClient
+
+from recipes.management.commands.bench_api import Command as BenchCommand
+from recipes.management.commands.bench_api import consume
+
+EXPLAIN_PREFIXES = {
+    'postgresql': 'EXPLAIN (ANALYZE, BUFFERS) ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+}
+SORT_MARKERS = {
+    'postgresql': 'Sort Key:',
+    'sqlite': 'USE TEMP B-TREE',
+}
+# Сколько запросов сценария могут сортировать строки в базе данных.
+ALLOWED_SORTS = {
+    # DISTINCT по соединению с тегами в подсчёте и в выборке страницы.
+    'recipes_filter_tags': 2,
+    # Порядок рецептов при соединении с избранным.
+    'recipes_favorited': 1,
+    # Список покупок упорядочен по названию ингредиента.
+    'shopping_list': 1,
+}
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper: запоминает SQL-запросы с параметрами."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    """Планы SQL-запросов основных endpoint'ов API.
+
+    Для сценариев bench_api выполняет запрос с пустыми кэшами, чтобы
+    получить все запросы к базе данных, и выводит план каждого из них:
+    EXPLAIN ANALYZE в PostgreSQL, EXPLAIN QUERY PLAN в SQLite.
+    С --check проверяет, что запросы не сортируют больше, чем
+    указано в ALLOWED_SORTS: например, из-за вернувшегося
+    Meta.ordering у модели.
+    """
+    help = 'Вывести планы SQL-запросов основных endpoint\'ов API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', help='Файл для сохранения планов'
+        )
+        parser.add_argument(
+            '--scenario', action='append', default=[],
+            help='Сценарий bench_api; по умолчанию все'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Завершиться с ошибкой, если в планах появились '
+                 'сортировки сверх ALLOWED_SORTS'
+        )
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(EXPLAIN_PREFIXES[connection.vendor] + sql, params)
+            rows = cursor.fetchall()
+        if connection.vendor == 'sqlite':
+            return [f'{row[0]} {row[1]} {row[3]}' for row in rows]
+        return [row[0] for row in rows]
+
+    def handle(self, *args, **options):
+        user, scenarios = BenchCommand().scenarios()
+        anonymous = APIClient(SERVER_NAME='localhost')
+        authorized = APIClient(SERVER_NAME='localhost')
+        authorized.force_authenticate(user)
+        lines = [f'-- {connection.vendor}']
+        unexpected = []
+        for name, urls, auth in scenarios:
+            if options['scenario'] and name not in options['scenario']:
+                continue
+            for alias in ('default', 'responses', 'fragments'):
+                caches[alias].clear()
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                consume((authorized if auth else anonymous).get(urls[0]))
+            lines.append(f'\n== {name}: {urls[0]}')
+            sorts = 0
+            for sql, params in recorder.queries:
+                plan = self.explain(sql, params)
+                lines.append(f'\n{sql}\n  params: {list(params or ())}')
+                lines.extend(f'  {line}' for line in plan)
+                sorts += any(
+                    SORT_MARKERS[connection.vendor] in line for line in plan
+                )
+            if sorts > ALLOWED_SORTS.get(name, 0):
+                unexpected.append(f'{name} ({sorts})')
+        report = '\n'.join(lines) + '\n'
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report)
+        self.stdout.write(report)
+        if options['check'] and unexpected:
+            raise CommandError(
+                'Лишние сортировки в планах запросов: '
+                + ', '.join(unexpected)
+            )
@@ -0,0 +1,248 @@
+import random
+import time
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.management.commands.load_data import batches
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientToRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag
+)
+from recipes.pantry_index import recipe_ingredients_changed
+from recipes.versions import bump_on_commit, model_label
+from users.models import Follow, User, UserStats
+
+TAG_COLORS = ('#E26C2D', '#49B64E', '#8775D2', '#2D9CDB', '#F2C94C')
+
+
+def bulk_create(model, objs, batch_size):
+    """bulk_create пачками по batch_size объектов.
+
+    Django 2.2 не ограничивает явный batch_size лимитами SQLite,
+    поэтому пачки нарезаются здесь, а размер запроса выбирает Django.
+    """
+    for batch in batches(objs, batch_size):
+        model.objects.bulk_create(batch)
+
+
+def skewed_sample(population, cum_weights, count, exclude=None):
+    """Выборка без повторов, в которой первые элементы популярнее."""
+    count = min(count, len(population) - (exclude is not None))
+    chosen = set()
+    while len(chosen) < count:
+        for item in random.choices(
+            population, cum_weights=cum_weights, k=count - len(chosen)
+        ):
+            if item != exclude:
+                chosen.add(item)
+    return chosen
+
+
+class Command(BaseCommand):
+    """Генерация синтетических данных для нагрузочного тестирования.
+
+    Пользователи, рецепты, подписки, избранное и корзины создаются
+    пачками через bulk_create. Популярность авторов и рецептов
+    распределена по закону Ципфа. Счётчики и списки покупок
+    пересчитываются в конце, так как bulk_create не вызывает сигналы.
+    """
+    help = 'Сгенерировать синтетические данные'
+
+    def add_arguments(self, parser):
+        for name, default, help_text in (
+            ('users', 1000, 'Количество пользователей'),
+            ('recipes', 5000, 'Количество рецептов'),
+            ('ingredients-per-recipe', 8, 'Ингредиентов в рецепте'),
+            ('tags-per-recipe', 2, 'Тегов у рецепта'),
+            ('follows', 10, 'Подписок у пользователя'),
+            ('favorites', 20, 'Избранных рецептов у пользователя'),
+            ('carts', 5, 'Рецептов в корзине пользователя'),
+            ('batch-size', 5000, 'Размер пачки при вставке'),
+        ):
+            parser.add_argument(
+                f'--{name}', type=int, default=default, help=help_text
+            )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел'
+        )
+        parser.add_argument(
+            '--prefix', default='gen',
+            help='Префикс имён пользователей и рецептов'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--users и --batch-size должны быть больше 0')
+        random.seed(options['seed'])
+        started = time.perf_counter()
+        with transaction.atomic():
+            tags = self.ensure_tags()
+            ingredients = self.ensure_ingredients(
+                options['ingredients_per_recipe']
+            )
+            users = self.create_users(options)
+            recipes = self.create_recipes(options, users, tags, ingredients)
+            self.create_relations(options, users, recipes)
+            call_command('recount_counters', stdout=self.stdout)
+            for batch in batches(users, options['batch_size']):
+                ShoppingListItem.objects.rebuild(batch)
+            recipe_ingredients_changed()
+        self.stdout.write(
+            f'Создано {len(users)} пользователей и {len(recipes)} рецептов '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
+
+    def ensure_tags(self):
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=f'Тег {index}', slug=f'tag-{index}', color=color)
+                for index, color in enumerate(TAG_COLORS)
+            )
+            bump_on_commit(model_label(Tag))
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def ensure_ingredients(self, per_recipe):
+        if Ingredient.objects.count() < per_recipe:
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(
+                        name=f'ингредиент {index}', measurement_unit='г'
+                    )
+                    for index in range(per_recipe)
+                ),
+                ignore_conflicts=True
+            )
+            bump_on_commit(model_label(Ingredient))
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def create_users(self, options):
+        prefix = options['prefix']
+        offset = User.objects.filter(
+            username__startswith=f'{prefix}_'
+        ).count()
+        password = make_password(prefix)
+        last_id = User.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        bulk_create(
+            User,
+            (
+                User(
+                    username=f'{prefix}_{index}',
+                    email=f'{prefix}_{index}@foodgram.ru',
+                    first_name='Имя',
+                    last_name='Фамилия',
+                    password=password
+                )
+                for index in range(offset, offset + options['users'])
+            ),
+            options['batch_size']
+        )
+        users = list(User.objects.filter(id__gt=last_id).values_list(
+            'id', flat=True
+        ))
+        bulk_create(
+            UserStats,
+            (UserStats(user_id=user_id) for user_id in users),
+            options['batch_size']
+        )
+        return users
+
+    def create_recipes(self, options, users, tags, ingredients):
+        prefix = options['prefix']
+        offset = Recipe.objects.filter(
+            name__startswith=f'{prefix} '
+        ).count()
+        last_id = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        author_weights = list(accumulate(
+            1 / rank for rank in range(1, len(users) + 1)
+        ))
+        authors = random.choices(
+            users, cum_weights=author_weights, k=options['recipes']
+        )
+        bulk_create(
+            Recipe,
+            (
+                Recipe(
+                    author_id=author,
+                    name=f'{prefix} рецепт {offset + index}',
+                    text='Описание рецепта',
+                    cooking_time=random.randint(1, 180)
+                )
+                for index, author in enumerate(authors)
+            ),
+            options['batch_size']
+        )
+        recipes = list(Recipe.objects.filter(id__gt=last_id).values_list(
+            'id', flat=True
+        ))
+        per_recipe = min(options['ingredients_per_recipe'], len(ingredients))
+        bulk_create(
+            IngredientToRecipe,
+            (
+                IngredientToRecipe(
+                    recipe_id=recipe,
+                    ingredient_id=ingredient,
+                    amount=random.randint(1, 500)
+                )
+                for recipe in recipes
+                for ingredient in random.sample(ingredients, per_recipe)
+            ),
+            options['batch_size']
+        )
+        RecipeTag = Recipe.tags.through
+        bulk_create(
+            RecipeTag,
+            (
+                RecipeTag(recipe_id=recipe, tag_id=tag)
+                for recipe in recipes
+                for tag in random.sample(
+                    tags, min(options['tags_per_recipe'], len(tags))
+                )
+            ),
+            options['batch_size']
+        )
+        return recipes
+
+    def create_relations(self, options, users, recipes):
+        """Подписки, избранное и корзины с перекосом к популярным."""
+        user_weights = list(accumulate(
+            1 / rank for rank in range(1, len(users) + 1)
+        ))
+        recipe_weights = list(accumulate(
+            1 / rank for rank in range(1, len(recipes) + 1)
+        ))
+        for model, field, population, weights, count, self_excluded in (
+            (Follow, 'author_id', users, user_weights,
+             options['follows'], True),
+            (Favorite, 'recipe_id', recipes, recipe_weights,
+             options['favorites'], False),
+            (ShoppingCart, 'recipe_id', recipes, recipe_weights,
+             options['carts'], False),
+        ):
+            if not population or count < 1:
+                continue
+            bulk_create(
+                model,
+                (
+                    model(user_id=user, **{field: target})
+                    for user in users
+                    for target in skewed_sample(
+                        population, weights, count,
+                        exclude=user if self_excluded else None
+                    )
+                ),
+                options['batch_size']
+            )
@@ -1,45 +1,160 @@
 import csv
-from django.core.management.base import BaseCommand
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
 from recipes.models import Ingredient, Tag
+from recipes.versions import bump_on_commit, model_label
+
+INGREDIENT_COLUMNS = ('name', 'measurement_unit')
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    batch = list(islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, size))
 
 
 class Command(BaseCommand):
-    """Класс для загрузки данных из CSV-файлов в модели Ingredient и Tag."""
+    """Класс для загрузки данных из CSV-файлов в модели Ingredient и Tag.
+
+    Загрузка идёт пачками в одной транзакции и повторный запуск
+    не создаёт дубликатов: ингредиенты сопоставляются по названию
+    и единице измерения, теги - по slug. На PostgreSQL ингредиенты
+    загружаются через COPY.
+    """
     help = ' Загрузить данные в модель ингредиентов '
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+            help='CSV-файл с колонками name, measurement_unit'
+        )
+        parser.add_argument(
+            '--tags',
+            default=os.path.join(settings.BASE_DIR, 'data', 'tags.csv'),
+            help='CSV-файл с колонками name_tag, tag_slug, color'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Размер пачки при вставке'
+        )
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже на PostgreSQL'
+        )
+
     def handle(self, *args, **options):
-        with open(
-            'data/ingredients.csv', encoding='utf-8'
-        ) as data_file_ingredients:
-            csv_reader_ingredients = csv.DictReader(
-                data_file_ingredients, delimiter=','
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        with transaction.atomic():
+            if options['ingredients']:
+                self.load_ingredients(options)
+            if options['tags']:
+                self.load_tags(options)
+
+    def report(self, model_name, rows, created, started):
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        self.stdout.write(
+            f'{model_name}: обработано {rows}, добавлено {created}, '
+            f'{rows / elapsed:.0f} строк/с'
+        )
+
+    def load_ingredients(self, options):
+        started = time.perf_counter()
+        before = Ingredient.objects.count()
+        with open(options['ingredients'], encoding='utf-8') as data_file:
+            if connection.vendor == 'postgresql' and not options['no_copy']:
+                rows = self.copy_ingredients(data_file)
+            else:
+                rows = self.bulk_create_ingredients(
+                    data_file, options['batch_size']
+                )
+        bump_on_commit(model_label(Ingredient))
+        self.report(
+            'Ингредиенты', rows, Ingredient.objects.count() - before, started
+        )
+
+    def bulk_create_ingredients(self, data_file, batch_size):
+        rows = 0
+        for batch in batches(csv.DictReader(data_file), batch_size):
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(
+                        name=row['name'],
+                        measurement_unit=row['measurement_unit']
+                    )
+                    for row in batch
+                ),
+                ignore_conflicts=True
+            )
+            rows += len(batch)
+        return rows
+
+    def copy_ingredients(self, data_file):
+        """Загрузка через COPY во временную таблицу и INSERT ... ON CONFLICT.
+        """
+        header = next(csv.reader([data_file.readline()]))
+        if sorted(header) != sorted(INGREDIENT_COLUMNS):
+            raise CommandError(
+                f'Ожидаются колонки {", ".join(INGREDIENT_COLUMNS)}'
             )
-            line_count = 0
-            for row in csv_reader_ingredients:
-                name = row['name']
-                unit = row['measurement_unit']
-                ingredient = Ingredient(name=name, measurement_unit=unit)
-                ingredient.save()
-                line_count += 1
-            print(f'Загружено {line_count} ингредиента(-ов)')
-
-        with open(
-            'data/tags.csv', encoding='utf-8',
-        ) as data_file_tags:
-            csv_reader_tags = csv.DictReader(
-                data_file_tags, delimiter=','
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE load_ingredients '
+                '(name varchar(200), measurement_unit varchar(200)) '
+                'ON COMMIT DROP'
             )
-            line_count_tags = 0
-            for row in csv_reader_tags:
-                name = row['name_tag']
-                slug = row['tag_slug']
-                color = row['color']
-                tags = Tag(
-                    name=name,
-                    color=color,
-                    slug=slug
+            cursor.copy_expert(
+                f'COPY load_ingredients ({", ".join(header)}) '
+                'FROM STDIN WITH (FORMAT csv)',
+                data_file
+            )
+            cursor.execute('SELECT count(*) FROM load_ingredients')
+            rows = cursor.fetchone()[0]
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT name, measurement_unit FROM load_ingredients '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+        return rows
+
+    def load_tags(self, options):
+        started = time.perf_counter()
+        rows = created = 0
+        with open(options['tags'], encoding='utf-8') as data_file:
+            for batch in batches(
+                csv.DictReader(data_file), options['batch_size']
+            ):
+                tags = {
+                    row['tag_slug']: Tag(
+                        name=row['name_tag'],
+                        color=row['color'],
+                        slug=row['tag_slug']
+                    )
+                    for row in batch
+                }
+                existing = Tag.objects.in_bulk(tags, field_name='slug')
+                Tag.objects.bulk_create(
+                    tag for slug, tag in tags.items() if slug not in existing
                 )
-                tags.save()
-                line_count_tags += 1
-            print(f'Загружено {line_count_tags} тэга(-ов)')
+                changed = []
+                for slug, tag in existing.items():
+                    if (tag.name, tag.color) != (
+                        tags[slug].name, tags[slug].color
+                    ):
+                        tag.name, tag.color = tags[slug].name, tags[slug].color
+                        changed.append(tag)
+                Tag.objects.bulk_update(changed, ('name', 'color'))
+                rows += len(batch)
+                created += len(tags) - len(existing)
+        bump_on_commit(model_label(Tag))
+        self.report('Теги', rows, created, started)
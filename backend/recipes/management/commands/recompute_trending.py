@@ -0,0 +1,116 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import (
+    Case,
+    FloatField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+def decayed_activity(model, now, window_days, half_life_days):
+    """Подзапрос с суммой весов добавлений рецепта за окно.
+
+    Вес добавления убывает вдвое каждые half_life_days дней и
+    считается по суткам через CASE, чтобы запрос работал на любой СУБД.
+    """
+    weight = Case(
+        *(
+            When(
+                created__gte=now - timedelta(days=day + 1),
+                then=Value(0.5 ** (day / half_life_days))
+            )
+            for day in range(window_days)
+        ),
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+    return Coalesce(Subquery(
+        model.objects.filter(
+            recipe=OuterRef('pk'),
+            created__gte=now - timedelta(days=window_days)
+        ).order_by().values('recipe').annotate(
+            score=Sum(weight)
+        ).values('score'),
+        output_field=FloatField()
+    ), Value(0.0))
+
+
+class Command(BaseCommand):
+    """Пересчёт оценки trending_score для ленты ?ordering=trending.
+
+    Оценка - сумма затухающих весов добавлений в избранное и в корзину
+    за последние дни. Пересчёт выполняется одним UPDATE только для
+    рецептов с активностью за окно или с ненулевой оценкой. С --every
+    команда работает постоянно и повторяет пересчёт с этим интервалом.
+    """
+    help = 'Пересчитать оценку популярности рецептов за последнее время'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window-days', type=int,
+            default=settings.TRENDING_WINDOW_DAYS,
+            help='За сколько последних дней учитывать добавления'
+        )
+        parser.add_argument(
+            '--half-life-days', type=float,
+            default=settings.TRENDING_HALF_LIFE_DAYS,
+            help='Через сколько дней вес добавления уменьшается вдвое'
+        )
+        parser.add_argument(
+            '--cart-weight', type=float,
+            default=settings.TRENDING_CART_WEIGHT,
+            help='Вес добавления в корзину относительно избранного'
+        )
+        parser.add_argument(
+            '--every', type=int, default=0,
+            help='Повторять пересчёт каждые N секунд'
+        )
+
+    def handle(self, *args, **options):
+        if options['window_days'] < 1 or options['half_life_days'] <= 0:
+            raise CommandError(
+                '--window-days и --half-life-days должны быть больше 0'
+            )
+        while True:
+            self.recompute(options)
+            if not options['every']:
+                break
+            time.sleep(options['every'])
+
+    def recompute(self, options):
+        started = time.perf_counter()
+        now = timezone.now()
+        window_days = options['window_days']
+        since = now - timedelta(days=window_days)
+        updated = Recipe.objects.filter(
+            Q(trending_score__gt=0)
+            | Q(pk__in=Favorite.objects.filter(
+                created__gte=since
+            ).values('recipe'))
+            | Q(pk__in=ShoppingCart.objects.filter(
+                created__gte=since
+            ).values('recipe'))
+        ).update(trending_score=(
+            decayed_activity(
+                Favorite, now, window_days, options['half_life_days']
+            )
+            + options['cart_weight'] * decayed_activity(
+                ShoppingCart, now, window_days, options['half_life_days']
+            )
+        ))
+        self.stdout.write(
+            f'Оценки пересчитаны для {updated} рецептов '
+            f'за {time.perf_counter() - started:.2f} с'
+        )
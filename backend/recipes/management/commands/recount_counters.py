@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import User, UserStats
+
+
+def count_of(model, field):
+    """Подзапрос с числом строк model, ссылающихся на внешнюю запись."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+class Command(BaseCommand):
+    """Пересчёт денормализованных счётчиков для восстановления.
+
+    Каждый счётчик и поисковый вектор рецептов пересчитываются
+    одним UPDATE по всей таблице.
+    """
+    help = (
+        'Пересчитать счётчики избранного, корзины и рецептов '
+        'и поисковый вектор'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recipes = Recipe.objects.update(
+                favorites_count=count_of(Favorite, 'recipe'),
+                cart_count=count_of(ShoppingCart, 'recipe')
+            )
+            UserStats.objects.bulk_create(
+                (
+                    UserStats(user_id=user_id)
+                    for user_id in User.objects.filter(
+                        stats__isnull=True
+                    ).values_list('id', flat=True)
+                ),
+                ignore_conflicts=True
+            )
+            users = UserStats.objects.update(
+                recipes_count=count_of(Recipe, 'author')
+            )
+            Recipe.objects.update_search_vector()
+        self.stdout.write(
+            f'Пересчитаны счётчики {recipes} рецептов '
+            f'и {users} пользователей'
+        )
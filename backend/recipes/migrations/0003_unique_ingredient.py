@@ -0,0 +1,59 @@
+# Generated by Django 2.2.19 on 2026-10-16 23:32
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientToRecipe = apps.get_model('recipes', 'IngredientToRecipe')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = {}
+    for pk, name, unit in Ingredient.objects.order_by('id').values_list(
+        'id', 'name', 'measurement_unit'
+    ):
+        duplicates.setdefault((name, unit), []).append(pk)
+    merged = {
+        pk: pks[0]
+        for pks in duplicates.values() if len(pks) > 1
+        for pk in pks[1:]
+    }
+    if not merged:
+        return
+    for pk, original in merged.items():
+        IngredientToRecipe.objects.filter(ingredient_id=pk).update(
+            ingredient_id=original
+        )
+    users = set(ShoppingListItem.objects.filter(
+        ingredient_id__in=merged
+    ).values_list('user_id', flat=True))
+    ShoppingListItem.objects.filter(user_id__in=users).delete()
+    ShoppingListItem.objects.bulk_create(
+        ShoppingListItem(
+            user_id=row['recipe__shopping_cart__user'],
+            ingredient_id=row['ingredient'],
+            amount=row['total']
+        )
+        for row in IngredientToRecipe.objects.filter(
+            recipe__shopping_cart__user__in=users
+        ).order_by().values(
+            'recipe__shopping_cart__user', 'ingredient'
+        ).annotate(total=models.Sum('amount'))
+    )
+    Ingredient.objects.filter(id__in=merged).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
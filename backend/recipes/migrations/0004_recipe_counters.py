@@ -0,0 +1,43 @@
+# Generated by Django 2.2.19 on 2026-10-16 23:35
+
+from django.db import migrations, models
+import django.db.models.functions
+
+
+def count_recipe_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for field, model_name in (
+        ('favorites_count', 'Favorite'),
+        ('cart_count', 'ShoppingCart'),
+    ):
+        model = apps.get_model('recipes', model_name)
+        Recipe.objects.update(**{field: django.db.models.functions.Coalesce(
+            models.Subquery(
+                model.objects.filter(
+                    recipe=models.OuterRef('pk')
+                ).order_by().values('recipe').annotate(
+                    count=models.Count('pk')
+                ).values('count')
+            ), 0
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.RunPython(count_recipe_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.19 on 2026-10-16 23:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants_format',
+            field=models.CharField(blank=True, editable=False, max_length=4, verbose_name='Формат уменьшенных копий изображения'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.19 on 2026-10-16 23:58
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+SEARCH_INDEX = 'recipe_search_vector_gin'
+
+
+def create_search_index(apps, schema_editor):
+    """GIN-индекс и заполнение вектора существующих рецептов.
+
+    Только для PostgreSQL: на других СУБД поиск идёт без вектора.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'UPDATE recipes_recipe AS recipe SET search_vector = '
+        "setweight(to_tsvector(%(config)s, recipe.name), 'A') || "
+        "setweight(to_tsvector(%(config)s, recipe.text), 'B') || "
+        'setweight(to_tsvector(%(config)s, coalesce(('
+        "SELECT string_agg(ingredient.name, ' ') "
+        'FROM recipes_ingredienttorecipe AS link '
+        'JOIN recipes_ingredient AS ingredient '
+        'ON ingredient.id = link.ingredient_id '
+        "WHERE link.recipe_id = recipe.id), '')), 'C')",
+        {'config': settings.SEARCH_CONFIG}
+    )
+    schema_editor.execute(
+        f'CREATE INDEX {SEARCH_INDEX} ON recipes_recipe '
+        'USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_image_variants_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,11 +1,31 @@
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    SearchVectorField
+)
 from django.core.validators import (
     RegexValidator,
     MinValueValidator,
     MaxValueValidator
 )
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import connection, models, transaction
+from django.db.models import (
+    F,
+    OuterRef,
+    Prefetch,
+    Q,
+    Subquery,
+    Sum,
+    TextField,
+    UniqueConstraint,
+    Value,
+    Window
+)
+from django.db.models.functions import Coalesce, RowNumber
 
+from recipes.images import variant_names
 from users.models import User
 
 
@@ -51,6 +71,12 @@ class Ingredient(models.Model):
     )
 
     class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient'
+            )
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
@@ -59,6 +85,117 @@ class Ingredient(models.Model):
         return f'{self.name} - ({self.measurement_unit})'
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Запросы к рецептам."""
+
+    def with_author(self):
+        """Рецепты с автором, без тегов и ингредиентов."""
+        return self.defer('search_vector').select_related('author')
+
+    @staticmethod
+    def related_lookups():
+        """Предзагрузки тегов и ингредиентов для prefetch_related."""
+        return (
+            'tags',
+            Prefetch(
+                'ingredienttorecipe',
+                queryset=IngredientToRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
+
+    def with_related(self):
+        """Рецепты с автором, тегами и ингредиентами.
+
+        Связанные данные подгружаются пачкой, поэтому число запросов
+        не зависит от размера страницы. Признаки избранного, корзины
+        и подписки берутся из recipes.user_state.
+        """
+        return self.with_author().prefetch_related(*self.related_lookups())
+
+    def latest_by_author(self, authors, limit=None):
+        """Последние limit рецептов каждого из авторов одним запросом.
+
+        Номер рецепта внутри автора считается оконной функцией
+        ROW_NUMBER() OVER (PARTITION BY author_id ORDER BY id DESC).
+        """
+        queryset = self.filter(author__in=authors).order_by('-id')
+        if limit is None:
+            return queryset
+        ranked = queryset.order_by().annotate(recipe_rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('author')],
+            order_by=F('id').desc()
+        )).values('id', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+        column = '.'.join(
+            connection.ops.quote_name(name)
+            for name in (self.model._meta.db_table, 'id')
+        )
+        return queryset.extra(
+            where=[
+                f'{column} IN (SELECT id FROM ({sql}) ranked '
+                f'WHERE recipe_rank <= %s)'
+            ],
+            params=(*params, limit)
+        )
+
+    def search(self, text):
+        """Поиск рецептов по названию, описанию и ингредиентам.
+
+        На PostgreSQL используется поисковый вектор с GIN-индексом
+        и сортировка по релевантности. На других СУБД каждое слово
+        ищется через icontains без ранжирования.
+        """
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(
+                text, config=settings.SEARCH_CONFIG, search_type='plain'
+            )
+            return self.filter(search_vector=query).annotate(
+                rank=SearchRank(F('search_vector'), query)
+            ).order_by('-rank', '-id')
+        queryset = self
+        for word in text.split():
+            queryset = queryset.filter(
+                Q(name__icontains=word)
+                | Q(text__icontains=word)
+                | Q(pk__in=IngredientToRecipe.objects.filter(
+                    ingredient__name__icontains=word
+                ).values('recipe'))
+            )
+        return queryset
+
+    def update_search_vector(self):
+        """Пересчитывает поисковый вектор рецептов одним UPDATE.
+
+        Вес A получает название, B - описание, C - названия ингредиентов.
+        Вне PostgreSQL вектор не используется и не пересчитывается.
+        """
+        if connection.vendor != 'postgresql':
+            return 0
+        from django.contrib.postgres.aggregates import StringAgg
+
+        ingredient_names = Subquery(
+            IngredientToRecipe.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                names=StringAgg('ingredient__name', delimiter=' ')
+            ).values('names'),
+            output_field=TextField()
+        )
+        config = settings.SEARCH_CONFIG
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=config)
+            + SearchVector('text', weight='B', config=config)
+            + SearchVector(
+                Coalesce(ingredient_names, Value('')),
+                weight='C',
+                config=config
+            )
+        ))
+
+
 class Recipe(models.Model):
     """Модель рецептов."""
     tags = models.ManyToManyField(
@@ -70,7 +207,8 @@ class Recipe(models.Model):
         User,
         verbose_name='Автор рецепта',
         on_delete=models.CASCADE,
-        related_name='recipes'
+        related_name='recipes',
+        db_index=False
     )
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -105,8 +243,50 @@ class Recipe(models.Model):
             )
         ]
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    cart_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False
+    )
+    image_variants_format = models.CharField(
+        verbose_name='Формат уменьшенных копий изображения',
+        max_length=4,
+        blank=True,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
+    trending_score = models.FloatField(
+        verbose_name='Оценка популярности за последнее время',
+        default=0,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_popular_idx'
+            ),
+            models.Index(
+                fields=('-trending_score', '-id'),
+                name='recipe_trending_idx'
+            ),
+            models.Index(
+                fields=('author', '-id'),
+                name='recipe_author_idx'
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-id', )
@@ -114,6 +294,13 @@ class Recipe(models.Model):
     def __str__(self):
         return f'{self.name} автор: {self.author.get_username()}'
 
+    @property
+    def image_variants(self):
+        """Пути уменьшенных копий изображения или None, пока их нет."""
+        if not self.image or not self.image_variants_format:
+            return None
+        return variant_names(self.image.name, self.image_variants_format)
+
 
 class IngredientToRecipe(models.Model):
     """Модель связки рецепта и ингредиента."""
@@ -126,7 +313,8 @@ class IngredientToRecipe(models.Model):
         Recipe,
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
-        related_name='ingredienttorecipe'
+        related_name='ingredienttorecipe',
+        db_index=False
     )
     amount = models.PositiveSmallIntegerField(
         verbose_name='Количество',
@@ -145,9 +333,14 @@ class IngredientToRecipe(models.Model):
     )
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=('recipe', 'ingredient'),
+                name='recipe_ingredient_idx'
+            ),
+        ]
         verbose_name = 'Ингредиент рецепта'
         verbose_name_plural = 'Ингредиенты рецепта'
-        ordering = ('recipe',)
 
     def __str__(self):
         return (
@@ -163,12 +356,19 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Пользователь',
         related_name='favorites',
+        db_index=False
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         verbose_name='Избранный рецепт',
         related_name='favorites',
+        db_index=False
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True,
+        db_index=True
     )
 
     class Meta:
@@ -178,9 +378,14 @@ class Favorite(models.Model):
                 name='user_favorite_unique'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('recipe', 'created'),
+                name='favorite_recipe_created_idx'
+            ),
+        ]
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
-        ordering = ('recipe',)
 
     def __str__(self):
         return (
@@ -197,12 +402,19 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Пользователь',
         related_name='shopping_cart',
+        db_index=False
     )
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
         related_name='shopping_cart',
+        db_index=False
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True,
+        db_index=True
     )
 
     class Meta:
@@ -212,12 +424,137 @@ class ShoppingCart(models.Model):
                 name='user_shopping_unique'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('recipe', 'created'),
+                name='cart_recipe_created_idx'
+            ),
+        ]
         verbose_name = 'Товар в корзине',
         verbose_name_plural = 'Товары в корзине'
-        ordering = ('user',)
 
     def __str__(self):
         return (
             f'Рецепт {self.recipe.name} в списке покупок пользователя: '
             f'{self.user.get_username}'
         )
+
+
+class ShoppingListManager(models.Manager):
+    """Поддержка списка покупок в актуальном состоянии."""
+
+    def _apply(self, user_id, amounts):
+        """Прибавляет к списку пользователя количества из amounts.
+
+        Недостающие позиции сначала вставляются с нулевым количеством
+        через ON CONFLICT DO NOTHING, чтобы параллельное добавление того
+        же ингредиента не нарушало уникальность, а затем все позиции
+        блокируются и обновляются.
+        """
+        with transaction.atomic():
+            self.bulk_create(
+                (
+                    self.model(
+                        user_id=user_id, ingredient_id=ingredient_id, amount=0
+                    )
+                    for ingredient_id, amount in amounts.items()
+                    if amount > 0
+                ),
+                ignore_conflicts=True
+            )
+            to_update, to_delete = [], []
+            for item in self.select_for_update().filter(
+                user_id=user_id, ingredient__in=amounts
+            ):
+                item.amount += amounts[item.ingredient_id]
+                if item.amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.pk)
+            self.bulk_update(to_update, ['amount'])
+            if to_delete:
+                self.filter(pk__in=to_delete).delete()
+
+    @staticmethod
+    def _recipe_amounts(recipe_id, sign=1):
+        amounts = {}
+        for ingredient_id, amount in IngredientToRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', 'amount'):
+            amounts[ingredient_id] = (
+                amounts.get(ingredient_id, 0) + sign * amount
+            )
+        return amounts
+
+    def add_recipe(self, user_id, recipe_id):
+        """Добавляет ингредиенты рецепта в список покупок."""
+        self._apply(user_id, self._recipe_amounts(recipe_id))
+
+    def remove_recipe(self, user_id, recipe_id):
+        """Вычитает ингредиенты рецепта из списка покупок."""
+        self._apply(user_id, self._recipe_amounts(recipe_id, sign=-1))
+
+    def rebuild(self, users):
+        """Полностью пересчитывает списки покупок пользователей."""
+        with transaction.atomic():
+            self.filter(user__in=users).delete()
+            self.bulk_create(
+                self.model(
+                    user_id=row['recipe__shopping_cart__user'],
+                    ingredient_id=row['ingredient'],
+                    amount=row['total']
+                )
+                for row in IngredientToRecipe.objects.filter(
+                    recipe__shopping_cart__user__in=users
+                ).order_by().values(
+                    'recipe__shopping_cart__user', 'ingredient'
+                ).annotate(total=Sum('amount'))
+            )
+
+    def rebuild_for_recipe(self, recipe):
+        """Пересчитывает списки всех, у кого рецепт лежит в корзине."""
+        users = list(ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list('user_id', flat=True))
+        if users:
+            self.rebuild(users)
+
+
+class ShoppingListItem(models.Model):
+    """Модель итогового списка покупок пользователя.
+
+    Хранит суммарное количество каждого ингредиента по всем рецептам
+    из корзины, чтобы выгрузка не требовала агрегации.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество'
+    )
+
+    objects = ShoppingListManager()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='user_shopping_list_unique'
+            )
+        ]
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Списки покупок'
+
+    def __str__(self):
+        return (
+            f'{self.ingredient.name} - {self.amount} в списке покупок '
+            f'пользователя: {self.user.get_username()}'
+        )
@@ -0,0 +1,209 @@
+import heapq
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import chain
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from backend.routers import use_primary
+from recipes.models import IngredientToRecipe, Recipe
+from recipes.versions import bump_version, get_version
+
+CHANGES_KEY = 'pantry-changes:{}'
+CHANGES_TIMEOUT = 24 * 60 * 60
+MAX_PENDING_VERSIONS = 500
+MAX_OVERLAY_SHARE = 0.1
+
+
+def recipe_ingredients_changed(recipe_ids=None):
+    """Сообщает индексам об изменении состава рецептов.
+
+    После фиксации транзакции увеличивается версия IngredientToRecipe,
+    а в кэш записываются id изменённых рецептов, чтобы индекс обновил
+    только их. Без recipe_ids индексы будут перестроены целиком.
+    """
+    recipe_ids = None if recipe_ids is None else list(recipe_ids)
+
+    def publish():
+        version = bump_version(IngredientToRecipe)
+        if recipe_ids is not None:
+            cache.set(
+                CHANGES_KEY.format(version), recipe_ids, CHANGES_TIMEOUT
+            )
+
+    transaction.on_commit(publish)
+
+
+class PantryData:
+    """Снимок индекса: не меняется после создания.
+
+    postings - отсортированные id рецептов для каждого ингредиента,
+    offsets и flat - ингредиенты рецептов в формате CSR, overlay -
+    ингредиенты рецептов, изменённых после полной сборки.
+    """
+
+    def __init__(self, version, postings, offsets, flat, overlay):
+        self.version = version
+        self.postings = postings
+        self.offsets = offsets
+        self.flat = flat
+        self.overlay = overlay
+
+    def ingredients_of(self, recipe_id):
+        if recipe_id in self.overlay:
+            return self.overlay[recipe_id]
+        if recipe_id + 1 < len(self.offsets):
+            return self.flat[
+                self.offsets[recipe_id]:self.offsets[recipe_id + 1]
+            ]
+        return ()
+
+    def size_of(self, recipe_id):
+        if recipe_id in self.overlay:
+            return len(self.overlay[recipe_id])
+        if recipe_id + 1 < len(self.offsets):
+            return self.offsets[recipe_id + 1] - self.offsets[recipe_id]
+        return 0
+
+
+class RankedRecipes:
+    """Рецепты, отсортированные по доле имеющихся ингредиентов.
+
+    Поддерживает len() и срезы, поэтому подходит для пагинатора,
+    а сортируется только та часть, которая нужна для страницы.
+    Элементы - кортежи (id рецепта, найдено, всего ингредиентов).
+    """
+
+    def __init__(self, data, hits):
+        self.data = data
+        self.hits = hits
+
+    def __len__(self):
+        return len(self.hits)
+
+    def key(self, item):
+        recipe_id, hits = item
+        size = self.data.size_of(recipe_id)
+        return -hits / size, size - hits, -recipe_id
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        stop = len(self) if index.stop is None else index.stop
+        top = heapq.nsmallest(stop, self.hits.items(), key=self.key)
+        return [
+            (recipe_id, hits, self.data.size_of(recipe_id))
+            for recipe_id, hits in top[index]
+        ]
+
+
+class PantryIndex:
+    """Инвертированный индекс «ингредиент - рецепты» в памяти процесса.
+
+    Для подбора рецептов по имеющимся ингредиентам считает совпадения
+    по спискам рецептов этих ингредиентов, не обращаясь к базе данных.
+    При смене версии IngredientToRecipe обновляет только рецепты
+    из журнала изменений в кэше, а если журнала нет или изменений
+    накопилось много - перестраивается полностью.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    def build(self, version):
+        max_id = Recipe.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        offsets = array('I', bytes(4 * (max_id + 2)))
+        flat = array('I')
+        postings = {}
+        for recipe_id, ingredient_id in IngredientToRecipe.objects.order_by(
+            'recipe_id', 'ingredient_id'
+        ).values_list('recipe_id', 'ingredient_id').distinct().iterator():
+            if recipe_id > max_id:
+                continue
+            flat.append(ingredient_id)
+            offsets[recipe_id + 1] = len(flat)
+            postings.setdefault(ingredient_id, array('I')).append(recipe_id)
+        for recipe_id in range(1, max_id + 2):
+            if offsets[recipe_id] < offsets[recipe_id - 1]:
+                offsets[recipe_id] = offsets[recipe_id - 1]
+        return PantryData(version, postings, offsets, flat, {})
+
+    def load_changes(self, data, version):
+        """id рецептов, изменённых после версии снимка, или None."""
+        if not 0 < version - data.version <= MAX_PENDING_VERSIONS:
+            return None
+        keys = [
+            CHANGES_KEY.format(number)
+            for number in range(data.version + 1, version + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return None
+        return set(chain.from_iterable(changes.values()))
+
+    def update(self, data, version, recipe_ids):
+        """Новый снимок с обновлёнными ингредиентами recipe_ids."""
+        current = {recipe_id: array('I') for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id in IngredientToRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('recipe_id', 'ingredient_id').values_list(
+            'recipe_id', 'ingredient_id'
+        ).distinct():
+            current[recipe_id].append(ingredient_id)
+        postings = dict(data.postings)
+        overlay = dict(data.overlay)
+        copied = set()
+        for recipe_id, ingredients in current.items():
+            previous = set(data.ingredients_of(recipe_id))
+            for ingredient_id in previous.symmetric_difference(ingredients):
+                if ingredient_id not in copied:
+                    postings[ingredient_id] = array(
+                        'I', postings.get(ingredient_id, ())
+                    )
+                    copied.add(ingredient_id)
+                posting = postings[ingredient_id]
+                if ingredient_id in previous:
+                    del posting[bisect_left(posting, recipe_id)]
+                else:
+                    insort(posting, recipe_id)
+            overlay[recipe_id] = ingredients
+        return PantryData(version, postings, data.offsets, data.flat, overlay)
+
+    def _refresh(self, data, version):
+        if data is not None:
+            recipe_ids = self.load_changes(data, version)
+            if recipe_ids is not None and (
+                len(data.overlay) + len(recipe_ids)
+                <= MAX_OVERLAY_SHARE * max(len(data.offsets), 1000)
+            ):
+                return self.update(data, version, recipe_ids)
+        return self.build(version)
+
+    def _get_data(self):
+        version = get_version(IngredientToRecipe)
+        data = self._data
+        if data is None or data.version != version:
+            with self._lock:
+                data = self._data
+                if data is None or data.version != version:
+                    # Реплика может отставать от версии.
+                    with use_primary():
+                        data = self._data = self._refresh(data, version)
+        return data
+
+    def search(self, ingredient_ids):
+        """Рецепты, в которых есть хотя бы один из ingredient_ids."""
+        data = self._get_data()
+        hits = Counter(chain.from_iterable(
+            data.postings.get(ingredient_id, ())
+            for ingredient_id in set(ingredient_ids)
+        ))
+        return RankedRecipes(data, hits)
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,275 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save
+)
+from django.dispatch import receiver
+
+from recipes.images import delete_variants, schedule_variants
+from recipes.pantry_index import recipe_ingredients_changed
+from recipes.user_state import invalidate_user_state
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientToRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+    Tag
+)
+from recipes.versions import (
+    bump_on_commit,
+    model_label,
+    object_label
+)
+from users.models import UserStats
+
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'cart_count',
+}
+
+
+def change_counter(queryset, field, delta):
+    """Изменяет счётчик на delta одним UPDATE через F()."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    """Добавляет ингредиенты рецепта в список покупок."""
+    if created:
+        ShoppingListItem.objects.add_recipe(
+            instance.user_id, instance.recipe_id
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    """Убирает ингредиенты рецепта из списка покупок.
+
+    Срабатывает до удаления, пока ингредиенты рецепта ещё существуют,
+    в том числе при каскадном удалении самого рецепта.
+    """
+    ShoppingListItem.objects.remove_recipe(
+        instance.user_id, instance.recipe_id
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_reference_version(sender, **kwargs):
+    """Обновляет версию справочника после изменения тегов и ингредиентов.
+
+    По версии сбрасываются HTTP-кэш и индекс ингредиентов.
+    """
+    bump_on_commit(model_label(sender))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_recipes_search(sender, instance, created, **kwargs):
+    """Обновляет поисковый вектор рецептов после переименования."""
+    if not created:
+        Recipe.objects.filter(
+            ingredients=instance
+        ).update_search_vector()
+
+
+@receiver(pre_delete, sender=Ingredient)
+def remember_ingredient_recipes(sender, instance, **kwargs):
+    """Запоминает рецепты ингредиента: после удаления связей нет."""
+    instance._recipe_ids = list(
+        Recipe.objects.filter(ingredients=instance).values_list(
+            'id', flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Ingredient)
+def update_deleted_ingredient_recipes_search(sender, instance, **kwargs):
+    """Убирает удалённый ингредиент из поискового вектора рецептов."""
+    recipe_ids = getattr(instance, '_recipe_ids', None)
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).update_search_vector()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def reset_recipes_state(sender, instance, **kwargs):
+    """Сбрасывает кэш избранного или корзины пользователя."""
+    invalidate_user_state(
+        'favorites' if sender is Favorite else 'cart', instance.user_id
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increase_recipe_counter(sender, instance, created, **kwargs):
+    """Увеличивает счётчик избранного или корзины у рецепта."""
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id),
+            RECIPE_COUNTERS[sender],
+            1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_recipe_counter(sender, instance, **kwargs):
+    """Уменьшает счётчик избранного или корзины у рецепта."""
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id),
+        RECIPE_COUNTERS[sender],
+        -1
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_previous_recipe(sender, instance, **kwargs):
+    """Запоминает прежних автора и изображение рецепта.
+
+    Если изображение не менялось, формат его копий берётся из базы,
+    так как копии могли появиться после загрузки instance.
+    """
+    instance._previous_author_id = None
+    instance._previous_image = None
+    if instance.pk is None:
+        return
+    previous = Recipe.objects.filter(pk=instance.pk).values_list(
+        'author_id', 'image', 'image_variants_format'
+    ).first()
+    if previous is None:
+        return
+    instance._previous_author_id = previous[0]
+    if previous[1] == instance.image.name:
+        instance.image_variants_format = previous[2]
+    else:
+        instance._previous_image = previous[1:]
+        instance.image_variants_format = ''
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, **kwargs):
+    """Запускает создание копий нового изображения и удаляет старые."""
+    previous = getattr(instance, '_previous_image', None)
+    if previous is not None and previous[1]:
+        image_name, extension = previous
+        storage = instance.image.storage
+        transaction.on_commit(
+            lambda: delete_variants(image_name, extension, storage)
+        )
+    if instance.image and not instance.image_variants_format:
+        schedule_variants(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def update_author_recipes_count(sender, instance, created, **kwargs):
+    """Пересчитывает число рецептов автора при создании и смене автора."""
+    previous_author_id = getattr(instance, '_previous_author_id', None)
+    if created:
+        change_counter(
+            UserStats.objects.filter(user_id=instance.author_id),
+            'recipes_count',
+            1
+        )
+    elif previous_author_id not in (None, instance.author_id):
+        change_counter(
+            UserStats.objects.filter(user_id=previous_author_id),
+            'recipes_count',
+            -1
+        )
+        change_counter(
+            UserStats.objects.filter(user_id=instance.author_id),
+            'recipes_count',
+            1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_image_variants(sender, instance, **kwargs):
+    """Удаляет копии изображения удалённого рецепта."""
+    if instance.image and instance.image_variants_format:
+        image_name = instance.image.name
+        extension = instance.image_variants_format
+        storage = instance.image.storage
+        transaction.on_commit(
+            lambda: delete_variants(image_name, extension, storage)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_from_pantry_index(sender, instance, **kwargs):
+    """Убирает удалённый рецепт из индекса подбора по ингредиентам."""
+    recipe_ingredients_changed([instance.pk])
+
+
+@receiver(post_delete, sender=Ingredient)
+def rebuild_pantry_index(sender, **kwargs):
+    """Перестраивает индекс подбора после удаления ингредиента."""
+    recipe_ingredients_changed()
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_author_recipes_count(sender, instance, **kwargs):
+    """Уменьшает число рецептов автора после удаления рецепта."""
+    change_counter(
+        UserStats.objects.filter(user_id=instance.author_id),
+        'recipes_count',
+        -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def reset_recipe_responses(sender, instance, created, **kwargs):
+    """Сбрасывает кэш ответов с рецептом.
+
+    Версия модели Recipe служит версией списков рецептов: она меняется,
+    когда рецепт появляется, удаляется или меняет автора или теги.
+    """
+    labels = [object_label(Recipe, instance.pk)]
+    previous_author_id = getattr(instance, '_previous_author_id', None)
+    if created or previous_author_id not in (None, instance.author_id):
+        labels.append(model_label(Recipe))
+    bump_on_commit(*labels)
+
+
+@receiver(post_delete, sender=Recipe)
+def reset_deleted_recipe_responses(sender, instance, **kwargs):
+    bump_on_commit(object_label(Recipe, instance.pk), model_label(Recipe))
+
+
+@receiver(post_save, sender=IngredientToRecipe)
+@receiver(post_delete, sender=IngredientToRecipe)
+def reset_recipe_ingredients_responses(sender, instance, **kwargs):
+    """Сбрасывает кэш ответов после изменения ингредиента рецепта,
+    например в админ. панели.
+    """
+    bump_on_commit(object_label(Recipe, instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def reset_recipe_tags_responses(sender, instance, action, reverse, **kwargs):
+    """Сбрасывает кэш ответов после смены тегов рецепта.
+
+    При изменении со стороны тега сбрасываются все ответы с тегами.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        bump_on_commit(model_label(Tag), model_label(Recipe))
+    else:
+        bump_on_commit(
+            object_label(Recipe, instance.pk), model_label(Recipe)
+        )
@@ -0,0 +1,98 @@
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from backend.routers import reads_replica
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+
+STATE_KEY = 'user-state:{}:{}'
+
+STATE_SOURCES = {
+    'favorites': (Favorite, 'recipe_id'),
+    'cart': (ShoppingCart, 'recipe_id'),
+    'follows': (Follow, 'author_id'),
+}
+
+
+def state_key(kind, user_id):
+    return STATE_KEY.format(kind, user_id)
+
+
+def invalidate_user_state(kind, user_id):
+    """Сбрасывает закэшированный набор id пользователя.
+
+    Ключ удаляется сразу и ещё раз после фиксации транзакции, чтобы
+    параллельный запрос не оставил в кэше данные до изменения.
+    """
+    key = state_key(kind, user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+class UserState:
+    """Избранное, корзина и подписки пользователя в виде множеств id.
+
+    Наборы читаются из кэша одним запросом, отсутствующие - из базы
+    данных.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._cached = None
+        self._sets = {}
+
+    def get(self, kind):
+        if kind in self._sets:
+            return self._sets[kind]
+        if self._cached is None:
+            self._cached = cache.get_many([
+                state_key(name, self.user_id) for name in STATE_SOURCES
+            ])
+        key = state_key(kind, self.user_id)
+        packed = self._cached.get(key)
+        if packed is None:
+            model, field = STATE_SOURCES[kind]
+            ids = array('I', sorted(model.objects.filter(
+                user_id=self.user_id
+            ).values_list(field, flat=True)))
+            if not reads_replica():
+                cache.set(key, ids.tobytes(), settings.USER_STATE_TIMEOUT)
+        else:
+            ids = array('I')
+            ids.frombytes(packed)
+        self._sets[kind] = frozenset(ids)
+        return self._sets[kind]
+
+    @property
+    def favorites(self):
+        return self.get('favorites')
+
+    @property
+    def cart(self):
+        return self.get('cart')
+
+    @property
+    def follows(self):
+        return self.get('follows')
+
+
+class AnonymousState:
+    """Состояние анонимного пользователя: без обращений к кэшу и базе."""
+
+    favorites = cart = follows = frozenset()
+
+
+ANONYMOUS_STATE = AnonymousState()
+
+
+def get_user_state(request):
+    """Состояние пользователя запроса, загружаемое один раз за запрос."""
+    if request is None or not request.user.is_authenticated:
+        return ANONYMOUS_STATE
+    state = getattr(request, '_user_state', None)
+    if state is None or state.user_id != request.user.id:
+        state = request._user_state = UserState(request.user.id)
+    return state
@@ -0,0 +1,89 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'version:{}'
+MODIFIED_KEY = 'modified:{}'
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def object_label(model, pk):
+    """Метка версии отдельного объекта модели."""
+    return f'{model_label(model)}:{pk}'
+
+
+def reset_version(label):
+    """Заводит счётчик заново, например после очистки кэша.
+
+    Начальное значение берётся от текущего времени, чтобы не совпасть
+    с версиями, выданными до потери счётчика.
+    """
+    now = time.time()
+    cache.add(VERSION_KEY.format(label), int(now * 1000), None)
+    cache.set(MODIFIED_KEY.format(label), now, None)
+    return cache.get(VERSION_KEY.format(label)), now
+
+
+def get_versions(*models):
+    """Версии и время изменения моделей: {label: (версия, timestamp)}."""
+    labels = [model_label(model) for model in models]
+    values = cache.get_many(
+        [VERSION_KEY.format(label) for label in labels]
+        + [MODIFIED_KEY.format(label) for label in labels]
+    )
+    versions = {}
+    for label in labels:
+        version = values.get(VERSION_KEY.format(label))
+        modified = values.get(MODIFIED_KEY.format(label))
+        if version is None or modified is None:
+            version, modified = reset_version(label)
+        versions[label] = (version, modified)
+    return versions
+
+
+def get_version(model):
+    return get_versions(model)[model_label(model)][0]
+
+
+def get_label_versions(labels):
+    """Текущие версии по меткам моделей и объектов: {метка: версия}."""
+    keys = {label: VERSION_KEY.format(label) for label in labels}
+    values = cache.get_many(list(keys.values()))
+    return {
+        label: values[key] if key in values else reset_version(label)[0]
+        for label, key in keys.items()
+    }
+
+
+def bump_version(model):
+    """Увеличивает версию модели после изменения её данных.
+
+    Возвращает новую версию.
+    """
+    return bump_label(model_label(model))
+
+
+def bump_label(label):
+    try:
+        version = cache.incr(VERSION_KEY.format(label))
+    except ValueError:
+        return reset_version(label)[0]
+    cache.set(MODIFIED_KEY.format(label), time.time(), None)
+    return version
+
+
+def bump_on_commit(*labels):
+    """Увеличивает версии сразу и ещё раз после фиксации транзакции,
+    чтобы ответ, собранный до фиксации, не остался актуальным.
+    """
+
+    def publish():
+        for label in labels:
+            bump_label(label)
+
+    publish()
+    transaction.on_commit(publish)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from backend.settings import EMPTY_FIELD_VALUE
-from users.models import User, Follow
+from users.models import User, Follow, UserStats
 
 
 class UserAdmin(admin.ModelAdmin):
@@ -12,10 +12,19 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
         'password',
+        'recipes_count',
     )
+    list_select_related = ('stats',)
     search_fields = ('email', 'username')
     empty_value_display = EMPTY_FIELD_VALUE
 
+    def recipes_count(self, obj):
+        try:
+            return obj.stats.recipes_count
+        except UserStats.DoesNotExist:
+            return None
+    recipes_count.short_description = 'Количество рецептов'
+
 
 class FollowAdmin(admin.ModelAdmin):
     """Настройки админ. панели для модели подписок на авторов."""
@@ -23,7 +23,6 @@ class Follow(models.Model):
     )
 
     class Meta:
-        ordering = ('-id', )
         constraints = [
             UniqueConstraint(
                 fields=('user', 'author'),
@@ -48,3 +47,29 @@ class Follow(models.Model):
     def save(self, *args, **kwargs):
         self.full_clean()
         return super().save(*args, **kwargs)
+
+
+class UserStats(models.Model):
+    """Модель счётчиков пользователя.
+
+    Поддерживается сигналами, чтобы не считать рецепты автора
+    при каждом чтении.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return f'Статистика пользователя {self.user.get_username()}'
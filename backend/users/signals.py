@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.user_state import invalidate_user_state
+from recipes.versions import bump_on_commit, object_label
+from users.models import Follow, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    """Заводит счётчики для нового пользователя."""
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def reset_follows_state(sender, instance, **kwargs):
+    """Сбрасывает кэш подписок пользователя."""
+    invalidate_user_state('follows', instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def reset_author_responses(sender, instance, update_fields=None, **kwargs):
+    """Сбрасывает кэш ответов с рецептами пользователя.
+
+    Вход пользователя меняет только last_login и кэш не сбрасывает.
+    """
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        bump_on_commit(object_label(User, instance.pk))